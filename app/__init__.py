@@ -23,6 +23,22 @@ def create_app(config_class=Config):
     csrf.init_app(app)
     scheduler.init_app(app)
     scheduler.start()
+
+    from app.utils.catalog_cache import catalog_cache
+    catalog_cache.init_app(app)
+
+    from app.utils.dashboard_stats import dashboard_stats
+    dashboard_stats.init_app(app, scheduler)
+
+    from app.utils import reservations, webhook_inbox
+    reservations.init_app(app, scheduler)
+    webhook_inbox.init_app(app, scheduler)
+
+    from app.utils.cover_images import cover_store
+    cover_store.init_app(app)
+
+    from app.utils.assets import assets
+    assets.init_app(app)
     
     # Register Blueprints
     from app.main import bp as main_bp
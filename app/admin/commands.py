@@ -0,0 +1,52 @@
+import click
+from app import db
+from app.admin import bp
+from app.models import Book
+from app.utils.cover_images import cover_store, CoverImageError
+from app.utils.catalog_import import import_catalog, format_for, open_text
+from app.utils.data_export import export_rows, DATASETS, FORMATS
+
+
+@bp.cli.command('import-books')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']), help='Defaults to the file extension')
+@click.option('--chunk-size', default=1000, show_default=True, help='Rows per upsert batch')
+def import_books(path, fmt, chunk_size):
+    """Bulk upsert books from a CSV or JSONL file (matched on title + author)"""
+    fmt = fmt or format_for(path)
+    with open(path, 'rb') as f:
+        result = import_catalog(open_text(f), fmt, chunk_size=chunk_size)
+
+    for error in result.errors:
+        click.echo(error, err=True)
+    click.echo(f'Import finished: {result.summary()}')
+
+
+@bp.cli.command('export')
+@click.argument('dataset', type=click.Choice(list(DATASETS)))
+@click.option('--format', 'fmt', type=click.Choice(list(FORMATS)), default='csv', show_default=True)
+@click.option('--output', '-o', type=click.File('w', encoding='utf-8'), default='-', help='Defaults to stdout')
+def export(dataset, fmt, output):
+    """Stream books, order lines or payments to CSV/JSONL"""
+    for chunk in export_rows(dataset, fmt):
+        output.write(chunk)
+
+
+@bp.cli.command('fetch-covers')
+@click.option('--all', 'refetch', is_flag=True, help='Also re-ingest books that already have local covers')
+def fetch_covers(refetch):
+    """Download and resize remote cover images (e.g. after a bulk import)"""
+    query = Book.query.filter(Book.image_url.isnot(None), Book.image_url != '')
+    if not refetch:
+        query = query.filter(Book.image_key.is_(None))
+
+    done = failed = 0
+    for book in query.order_by(Book.id).all():
+        try:
+            book.image_key = cover_store.save(cover_store.fetch(book.image_url))
+            db.session.commit()
+            done += 1
+        except CoverImageError as e:
+            failed += 1
+            click.echo(f'Book {book.id}: {e}', err=True)
+    click.echo(f'Covers processed: {done} stored, {failed} failed')
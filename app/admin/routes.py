@@ -1,11 +1,24 @@
-from flask import render_template, request, redirect, url_for, flash, jsonify, session
+from flask import render_template, request, current_app, redirect, url_for, flash, jsonify, session, Response, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity, create_access_token, get_jwt
 from functools import wraps
 from app.admin import bp
 from app.models import User, Book, Order, Payment, GenreEnum, OrderItem
 from app import db, scheduler
 from app.config import Config
+from app.utils.search_service import search_service
+from app.utils.catalog_cache import catalog_cache
+from app.utils.pagination import keyset_paginate
+from app.utils.catalog_import import import_catalog, format_for, open_text
+from app.utils.data_export import export_rows, FORMATS
+from app.utils.cover_images import cover_store, CoverImageError
+from app.utils.inventory import restock_orders, take_order_stock, InsufficientStock
+from app.utils.reservations import delete_book_holds
+from app.utils.dashboard_stats import dashboard_stats, REVENUE_STATUSES
+from app.utils.order_queries import with_customer, order_details_or_404
+from app.utils.order_status import transition_orders, filtered_orders, remove_order_jobs, BulkStatusError, STATUSES, RELEASED
+from app.utils import webhook_inbox
 from sqlalchemy import func
+from datetime import datetime
 
 def admin_required(f):
     """Decorator to require admin role for routes"""
@@ -30,27 +43,58 @@ def admin_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+def update_cover(book, previous_url=None):
+    """Ingest the book's cover from the upload or image URL into local variants.
+
+    A remote URL is only downloaded when it changed (or was never ingested);
+    failures keep the book saveable and fall back to the remote URL.
+    """
+    upload = request.files.get('image_file')
+    try:
+        if upload and upload.filename:
+            book.image_key = cover_store.save(cover_store.read_upload(upload))
+        elif not book.image_url:
+            book.image_key = None
+        elif book.image_url != previous_url or not book.image_key:
+            book.image_key = None
+            book.image_key = cover_store.save(cover_store.fetch(book.image_url))
+    except CoverImageError as e:
+        flash(f'Cover image was not processed: {e}', 'warning')
+
 @bp.route('/dashboard')
 @admin_required
 def dashboard():
     """Admin dashboard with overview"""
-    # Get statistics
-    total_books = Book.query.count()
-    total_users = User.query.filter_by(role='user').count()
-    total_orders = Order.query.count()
-    total_revenue = db.session.query(func.sum(Order.total_amount)).filter(Order.status.in_(['completed', 'delivered'])).scalar() or 0
-    recent_books = Book.query.order_by(Book.created_at.desc()).limit(5).all()
+    # Get statistics (from the rollup and the catalog cache; no table scans)
+    total_books = dashboard_stats.total_books()
+    total_users = dashboard_stats.total_users('user')
+    total_orders = dashboard_stats.total_orders()
+    total_revenue = dashboard_stats.total_sales(REVENUE_STATUSES)
+    recent_books = catalog_cache.recent_books(5)
+    orders_by_status = {status: count for status, count, amount in dashboard_stats.orders_by_status()}
     
     stats = {
         'total_books': total_books,
         'total_users': total_users,
         'total_orders': total_orders,
         'total_revenue': total_revenue,
-        'recent_books': recent_books
+        'recent_books': recent_books,
+        'stock': catalog_cache.stock_levels(book.id for book in recent_books),
+        # Needing attention: paid orders waiting for stock, webhook events that gave up
+        'backordered': orders_by_status.get('backordered', 0),
+        'failed_events': webhook_inbox.failed_count()
     }
     
     return render_template('admin/dashboard.html', stats=stats)
 
+@bp.route('/stripe-events/retry', methods=['POST'])
+@admin_required
+def retry_stripe_events():
+    """Queue failed Stripe webhook events again (after fixing what made them fail)"""
+    retried = webhook_inbox.requeue_failed()
+    flash(f'{retried} failed payment event(s) queued again', 'success' if retried else 'info')
+    return redirect(url_for('admin.dashboard'))
+
 @bp.route('/books')
 @admin_required
 def manage_books():
@@ -58,19 +102,16 @@ def manage_books():
     page = request.args.get('page', 1, type=int)
     search = request.args.get('search', '', type=str)
     
-    query = Book.query
-    
     if search:
-        query = query.filter(
-            db.or_(
-                Book.title.contains(search),
-                Book.author.contains(search)
-            )
+        books = search_service.filter_books(Book.query, search).paginate(
+            page=page, per_page=8, error_out=False  # 8 books per page
+        )
+    else:
+        books = keyset_paginate(
+            Book.query, Book, per_page=8,
+            after=request.args.get('after'), before=request.args.get('before'),
+            count_key='books'
         )
-    
-    books = query.order_by(Book.created_at.desc()).paginate(
-        page=page, per_page=8, error_out=False  # 8 books per page
-    )
     
     return render_template('admin/manage_books.html', books=books, search=search)
 
@@ -102,6 +143,7 @@ def add_book():
                 stock=stock,
                 genre=genre
             )
+            update_cover(book)
             
             db.session.add(book)
             db.session.commit()
@@ -115,6 +157,28 @@ def add_book():
     
     return render_template('admin/add_book.html', genres=GenreEnum)
 
+@bp.route('/books/import', methods=['GET', 'POST'])
+@admin_required
+def import_books():
+    """Bulk import books from an uploaded CSV/JSONL file"""
+    if request.method == 'POST':
+        upload = request.files.get('file')
+        if not upload or not upload.filename:
+            flash('Please choose a file to import', 'warning')
+            return redirect(url_for('admin.import_books'))
+        
+        try:
+            # Streamed in chunks straight from the uploaded file
+            result = import_catalog(open_text(upload.stream), format_for(upload.filename))
+        except Exception as e:
+            flash(f'Error importing books: {str(e)}', 'danger')
+            return redirect(url_for('admin.import_books'))
+        
+        flash(f'Import finished: {result.summary()}', 'success' if not result.skipped else 'warning')
+        return render_template('admin/import_books.html', result=result, genres=GenreEnum)
+    
+    return render_template('admin/import_books.html', result=None, genres=GenreEnum)
+
 @bp.route('/books/edit/<int:book_id>', methods=['GET', 'POST'])
 @admin_required
 def edit_book(book_id):
@@ -128,6 +192,7 @@ def edit_book(book_id):
             book.author = request.form.get('author')
             book.price = float(request.form.get('price'))
             book.description = request.form.get('description')
+            previous_url = book.image_url
             book.image_url = request.form.get('image_url')
             book.stock = int(request.form.get('stock', 0))
             
@@ -136,6 +201,7 @@ def edit_book(book_id):
             if genre_value:
                 book.genre = GenreEnum(genre_value)
             
+            update_cover(book, previous_url)
             db.session.commit()
             
             flash(f'Book "{book.title}" updated successfully!', 'success')
@@ -161,6 +227,11 @@ def delete_book(book_id):
         flash(f'Cannot delete "{book.title}" - it has been ordered by customers. You can edit it instead.', 'warning')
         return redirect(url_for('admin.manage_books'))
     
+    # Finished checkout holds reference the book too
+    if not delete_book_holds(book_id):
+        flash(f'Cannot delete "{book.title}" - a customer is checking out with it. Try again later.', 'warning')
+        return redirect(url_for('admin.manage_books'))
+    
     try:
         title = book.title
         db.session.delete(book)
@@ -176,7 +247,6 @@ def delete_book(book_id):
 @admin_required
 def view_orders():
     """View all orders"""
-    page = request.args.get('page', 1, type=int)
     status_filter = request.args.get('status', '', type=str)
     
     query = Order.query
@@ -184,17 +254,30 @@ def view_orders():
     if status_filter:
         query = query.filter_by(status=status_filter)
     
-    orders = query.order_by(Order.created_at.desc()).paginate(
-        page=page, per_page=10, error_out=False
+    orders = keyset_paginate(
+        with_customer(query), Order, per_page=10,
+        after=request.args.get('after'), before=request.args.get('before'),
+        count_key=f'orders:status:{status_filter}'
     )
     
     return render_template('admin/orders.html', orders=orders, status_filter=status_filter)
 
+@bp.route('/export/<any(books, orders, payments):dataset>.<any(csv, jsonl):fmt>')
+@admin_required
+def export_data(dataset, fmt):
+    """Stream a CSV/JSONL export of books, order lines or payments"""
+    filename = f'{dataset}-{datetime.utcnow():%Y%m%d-%H%M%S}.{fmt}'
+    return Response(
+        stream_with_context(export_rows(dataset, fmt)),
+        mimetype=FORMATS[fmt],
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
+
 @bp.route('/orders/<int:order_id>/details')
 @admin_required
 def order_details(order_id):
     """View detailed order information including payment"""
-    order = Order.query.get_or_404(order_id)
+    order = order_details_or_404(order_id)
     return render_template('admin/order_details.html', order=order)
 
 
@@ -204,32 +287,25 @@ def update_order_status(order_id):
     """Update order status"""
     order = Order.query.get_or_404(order_id)
     new_status = request.form.get('status')
-    valid_statuses = ['pending', 'in_progress', 'delivered', 'cancelled', 'delayed', 'refunded']
+    valid_statuses = STATUSES
 
     
     if new_status in valid_statuses:
         old_status = order.status  # NOW defined properly
     
-    if new_status in ['pending', 'in_progress', 'delivered', 'cancelled', 'delayed', 'refunded']:
+    if new_status in STATUSES:
            # Handle stock restoration for cancelled/refunded orders
-        if new_status in ['cancelled', 'refunded'] and old_status not in ['cancelled', 'refunded']:
-            for order_item in order.items:
-                book = Book.query.get(order_item.book_id)
-                if book:
-                    book.stock += order_item.quantity
-                    print(f"Restored {order_item.quantity} units of {book.title} (new stock: {book.stock})")
+        if new_status in RELEASED and old_status not in RELEASED:
+            restock_orders([order.id], new_status)
         
-        # Handle stock reduction if moving from cancelled/refunded back to active
-        elif old_status in ['cancelled', 'refunded'] and new_status not in ['cancelled', 'refunded']:
-            for order_item in order.items:
-                book = Book.query.get(order_item.book_id)
-                if book:
-                    if book.stock >= order_item.quantity:
-                        book.stock -= order_item.quantity
-                        print(f"Reduced {order_item.quantity} units of {book.title} (new stock: {book.stock})")
-                    else:
-                        flash(f'Insufficient stock for {book.title}. Current stock: {book.stock}, required: {order_item.quantity}', 'danger')
-                        return redirect(url_for('admin.view_orders'))
+        # Handle stock reduction if moving from cancelled/refunded/backordered back to active
+        elif old_status in RELEASED and new_status not in RELEASED:
+            try:
+                take_order_stock([order.id])
+            except InsufficientStock as e:
+                db.session.rollback()
+                flash(str(e), 'danger')
+                return redirect(url_for('admin.view_orders'))
 
 
 
@@ -242,6 +318,72 @@ def update_order_status(order_id):
     
     return redirect(url_for('admin.view_orders'))
 
+@bp.route('/orders/bulk-status', methods=['POST'])
+@admin_required
+def bulk_order_status():
+    """Move the selected orders, or every order matching a filter, to one status.
+
+    Takes the orders page form, or JSON (send the X-CSRFToken header):
+    ``{"status": "delivered", "order_ids": [1, 2]}`` or
+    ``{"status": "delivered", "filter": {"status": "in_progress",
+    "created_from": "2024-05-01", "created_to": "2024-05-01"}}``; a filter
+    needs a status or a date bound.
+    All orders change in one transaction, or none do.
+    """
+    if request.is_json:
+        data = request.get_json(silent=True) or {}
+        new_status, order_ids, filters = data.get('status'), data.get('order_ids'), data.get('filter')
+    else:
+        new_status = request.form.get('status')
+        if request.form.get('scope') == 'filter':
+            order_ids, filters = None, {key: request.form.get(key) or None
+                                        for key in ('created_from', 'created_to')}
+            filters['status'] = request.form.get('filter_status') or None
+        else:
+            order_ids, filters = request.form.getlist('order_ids'), None
+
+    def reply(message, category, code=200, **extra):
+        if request.is_json:
+            return jsonify(success=category == 'success', message=message, **extra), code
+        flash(message, category)
+        return redirect(url_for('admin.view_orders', status=request.form.get('filter_status') or None))
+
+    try:
+        if order_ids is not None:
+            try:
+                order_ids = [int(order_id) for order_id in order_ids]
+            except (TypeError, ValueError):
+                raise BulkStatusError('order_ids must be a list of order numbers')
+            if not order_ids:
+                raise BulkStatusError('No orders selected')
+            query = Order.query.filter(Order.id.in_(order_ids))
+        elif isinstance(filters, dict):
+            if not any(filters.get(key) for key in ('status', 'created_from', 'created_to')):
+                # An empty filter would select every order
+                raise BulkStatusError('Give a status or date range')
+            query = filtered_orders(filters.get('status'), filters.get('created_from'), filters.get('created_to'))
+        else:
+            raise BulkStatusError('Give order_ids or a filter')
+
+        result = transition_orders(query, new_status, current_app.config.get('ORDER_BULK_MAX', 1000))
+        db.session.commit()
+    except BulkStatusError as e:
+        db.session.rollback()
+        return reply(str(e), 'danger', 400)
+    except InsufficientStock as e:
+        db.session.rollback()
+        return reply(str(e), 'danger', 409, shortages=[
+            {'book_id': book_id, 'title': title, 'stock': stock, 'requested': requested}
+            for book_id, title, stock, requested in e.shortages
+        ])
+
+    remove_order_jobs(result['order_ids'])
+    return reply(
+        f"{result['updated']} of {result['matched']} orders moved to {new_status}"
+        f" ({result['restocked']} restocked, {result['reinstated']} reinstated)",
+        'success', **result
+    )
+
 @bp.route('/orders/override-status/<int:order_id>', methods=['POST'])
 @admin_required
 def override_order_status(order_id):
@@ -249,30 +391,20 @@ def override_order_status(order_id):
     order = Order.query.get_or_404(order_id)
     new_status = request.form.get('status')
     
-    valid_statuses = ['pending', 'in_progress', 'delivered', 'cancelled', 'delayed', 'refunded']
+    valid_statuses = STATUSES
     
     if new_status in valid_statuses:
         old_status = order.status
         order.status = new_status
         
-        # If admin refunds, restore stock
-        if new_status == 'refunded' and old_status != 'refunded':
-            for order_item in order.items:
-                book = Book.query.get(order_item.book_id)
-                book.stock += order_item.quantity
+        # If admin refunds, restore stock (a cancelled or backordered order holds none)
+        if new_status == 'refunded' and old_status not in RELEASED:
+            restock_orders([order.id], 'refunded')
         
         db.session.commit()
         
         # Cancel any scheduled jobs for this order
-        try:
-            from app import scheduler
-            scheduler.remove_job(f'deliver_order_{order_id}')
-        except:
-            pass
-        try:
-            scheduler.remove_job(f'delay_order_{order_id}')
-        except:
-            pass
+        remove_order_jobs([order_id])
         
         flash(f'Order #{order_id} status updated to {new_status}', 'success')
     else:
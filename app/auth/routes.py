@@ -7,6 +7,8 @@ from app.models import User
 from app import db
 from app.utils.email_service import EmailService
 from app.utils.rate_limiter import rate_limiter
+from app.utils.cart_summary import refresh_cart_summary
+from app.utils.guest_cart import merge_guest_cart
 from email_validator import validate_email, EmailNotValidError
 
 
@@ -44,6 +46,7 @@ def login():
             user.role = 'admin' if is_admin_user else 'user'
             if hasattr(user, 'is_admin'):
                 user.is_admin = is_admin_user
+            merge_guest_cart(user.id)  # Same transaction as the role update
             db.session.commit()
             
             # Create JWT tokens
@@ -60,6 +63,7 @@ def login():
             session['role'] = user.role
             session['is_admin'] = is_admin_user
             session['login_method'] = 'email'
+            refresh_cart_summary(user.id)
             
             # print(f"Login successful for user: {user.username} (Admin: {is_admin_user})")  # Debug line
             
@@ -306,6 +310,9 @@ def github_callback():
         session['role'] = user.role
         session['is_admin'] = is_admin_user
         session['login_method'] = 'github'
+        if merge_guest_cart(user.id):
+            db.session.commit()
+        refresh_cart_summary(user.id)
         
         print(f"GitHub login successful for user: {user.username} (Admin: {is_admin_user})")  # Debug line
         
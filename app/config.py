@@ -33,6 +33,61 @@ class Config:
     STRIPE_PUBLISHABLE_KEY = os.environ.get('STRIPE_PUBLISHABLE_KEY')
     STRIPE_SECRET_KEY = os.environ.get('STRIPE_SECRET_KEY')
     STRIPE_WEBHOOK_SECRET = os.environ.get('STRIPE_WEBHOOK_SECRET')
+    # Point the Stripe client elsewhere, e.g. at stripe_standin.py for offline load tests
+    STRIPE_API_BASE = os.environ.get('STRIPE_API_BASE')
     
     # APScheduler Configuration
     SCHEDULER_API_ENABLED = True
+
+    # Cursor pagination: how long listing totals (COUNT(*)) are cached
+    PAGINATION_COUNT_CACHE_SECONDS = int(os.environ.get('PAGINATION_COUNT_CACHE_SECONDS', 60))
+
+    # Catalog cache: max cached books per worker, and how often each worker
+    # checks the shared catalog generation (bounds cross-worker staleness)
+    CATALOG_CACHE_SIZE = int(os.environ.get('CATALOG_CACHE_SIZE', 1024))
+    CATALOG_CACHE_CHECK_SECONDS = int(os.environ.get('CATALOG_CACHE_CHECK_SECONDS', 5))
+    # Longest a stock-changing transaction may take from stamping a book to committing
+    CATALOG_STOCK_OVERLAP_SECONDS = int(os.environ.get('CATALOG_STOCK_OVERLAP_SECONDS', 60))
+
+    # Book covers: resized variants are written here under content-hashed names
+    COVER_IMAGE_DIR = os.environ.get('COVER_IMAGE_DIR') or os.path.join(basedir, '..', 'instance', 'covers')
+    COVER_IMAGE_MAX_BYTES = int(os.environ.get('COVER_IMAGE_MAX_BYTES', 5 * 1024 * 1024))
+    COVER_IMAGE_DOWNLOAD_TIMEOUT = int(os.environ.get('COVER_IMAGE_DOWNLOAD_TIMEOUT', 10))
+    COVER_IMAGE_MAX_AGE = 365 * 24 * 3600
+
+    # Fingerprinted CSS/JS bundles (`flask assets build`), served from /assets/
+    ASSETS_OUTPUT_DIR = os.environ.get('ASSETS_OUTPUT_DIR') or os.path.join(basedir, 'static', 'dist')
+    ASSETS_MAX_AGE = 365 * 24 * 3600
+
+    # Checkout stock holds: how long a started checkout keeps its stock (at least
+    # 31 minutes, as Stripe sessions last 30), how often expired holds are swept,
+    # and how long finished holds are kept (orders are built from them, so longer
+    # than Stripe keeps retrying a webhook)
+    RESERVATION_HOLD_MINUTES = int(os.environ.get('RESERVATION_HOLD_MINUTES', 35))
+    RESERVATION_SWEEP_SECONDS = int(os.environ.get('RESERVATION_SWEEP_SECONDS', 60))
+    RESERVATION_PURGE_DAYS = int(os.environ.get('RESERVATION_PURGE_DAYS', 7))
+
+    # Anonymous carts live in a signed cookie until login merges them into Cart
+    GUEST_CART_MAX_LINES = int(os.environ.get('GUEST_CART_MAX_LINES', 50))
+    GUEST_CART_MAX_AGE = 30 * 24 * 3600
+
+    # Stripe webhooks are stored in an inbox and processed by a background job:
+    # poll interval, events per batch, and attempts before an event is marked failed
+    STRIPE_INBOX_POLL_SECONDS = int(os.environ.get('STRIPE_INBOX_POLL_SECONDS', 5))
+    STRIPE_INBOX_BATCH_SIZE = int(os.environ.get('STRIPE_INBOX_BATCH_SIZE', 50))
+    STRIPE_INBOX_MAX_ATTEMPTS = int(os.environ.get('STRIPE_INBOX_MAX_ATTEMPTS', 8))
+
+    # Success page: how long to wait for the webhook to record a payment before asking Stripe
+    CHECKOUT_STATE_WAIT_SECONDS = float(os.environ.get('CHECKOUT_STATE_WAIT_SECONDS', 2))
+    CHECKOUT_STATE_POLL_INTERVAL = 0.2
+
+    # Admin dashboard totals: per-worker cache lifetime, and how often the
+    # rollup is recomputed from the base tables
+    STATS_CACHE_SECONDS = int(os.environ.get('STATS_CACHE_SECONDS', 10))
+    STATS_RECONCILE_MINUTES = int(os.environ.get('STATS_RECONCILE_MINUTES', 15))
+
+    # Reuse a customer's open checkout session for an unchanged cart unless it ends this soon
+    CHECKOUT_SESSION_REUSE_MARGIN_MINUTES = int(os.environ.get('CHECKOUT_SESSION_REUSE_MARGIN_MINUTES', 5))
+
+    # Most orders one bulk status change may touch
+    ORDER_BULK_MAX = int(os.environ.get('ORDER_BULK_MAX', 1000))
@@ -1,41 +1,101 @@
-from flask import render_template, request, redirect, url_for, flash, jsonify, session
+from flask import render_template, request, redirect, url_for, flash, jsonify, session, abort, send_from_directory
 from app.main import bp
-from app.models import Book, User, Order
+from app.models import Book, User, Order, GenreEnum
 from app import db
+from app.utils.search_service import search_service
+from app.utils.pagination import keyset_paginate
+from app.utils.catalog_cache import catalog_cache
+from app.utils.http_cache import conditional_get
+from app.utils.suggest_index import suggest_index
+from app.utils.facet_index import facet_index, apply_facets, PRICE_BANDS
+from app.utils.cover_images import cover_store
+from app.utils.order_queries import with_lines
+
+def catalog_version():
+    """Validators for pages built from the whole catalog"""
+    generation, updated_at = catalog_cache.version()
+    return f'catalog-{generation}', updated_at
+
+def listing_version():
+    """Validators for pages that also show stock"""
+    generation, updated_at = catalog_cache.version()
+    stock_stamp = catalog_cache.stock_version()
+    return f'catalog-{generation}-{stock_stamp}', max(filter(None, (updated_at, stock_stamp)), default=None)
+
+def book_version(book_id):
+    """Validators for a single book page; ``updated_at`` is read fresh, since
+    stock writes set it without touching the cached snapshot"""
+    updated_at = db.session.query(Book.updated_at).filter(Book.id == book_id).scalar()
+    if updated_at is None:
+        return None
+    return f'book-{book_id}-{updated_at}', updated_at
 
 @bp.route('/')
+@conditional_get(catalog_version)
 def index():
-    # Get recent books (6 latest)
-    recent_books = Book.query.order_by(Book.created_at.desc()).limit(6).all()
+    # Get recent books (6 latest), served from the catalog cache
+    recent_books = catalog_cache.recent_books(6)
     return render_template('index.html', recent_books=recent_books)
 
 @bp.route('/books')
+@conditional_get(listing_version)
 def books():
     page = request.args.get('page', 1, type=int)
     search = request.args.get('search', '', type=str)
     
-    query = Book.query
+    # Facet filters: exact genre (enum name), price band key, in-stock only
+    genre = GenreEnum.__members__.get(request.args.get('genre', ''))
+    price = request.args.get('price', '')
+    if price not in [key for key, label, low, high in PRICE_BANDS]:
+        price = None
+    in_stock = request.args.get('in_stock') == '1'
+    filters = {
+        'genre': genre.name if genre else None,
+        'price': price,
+        'in_stock': '1' if in_stock else None
+    }
+    
+    query = apply_facets(Book.query, genre, price, in_stock)
+    facets = facet_index.counts(genre, price, in_stock)
     
     if search:
-        from sqlalchemy import cast, String
-        query = query.filter(
-            db.or_(
-                Book.title.ilike(f'%{search}%'),           
-                Book.author.ilike(f'%{search}%'),         
-                cast(Book.genre, String).ilike(f'%{search}%')
-            )
+        # Ranked full-text match (title, author, genre); relevance order needs page numbers
+        books = search_service.filter_books(query, search).paginate(
+            page=page, per_page=8, error_out=False
+        )
+    else:
+        # Newest first, cursor paginated so deep pages stay cheap; total comes from the facet counts
+        books = keyset_paginate(
+            query, Book, per_page=8,
+            after=request.args.get('after'), before=request.args.get('before'),
+            total=facets['total']
         )
     
-    books = query.order_by(Book.created_at.desc()).paginate(
-        page=page, per_page=8, error_out=False
-    )
-    
-    return render_template('main/books.html', books=books, search=search)
+    return render_template('main/books.html', books=books, search=search, filters=filters,
+                           facets=facets, genres=GenreEnum, price_bands=PRICE_BANDS)
+
+@bp.route('/books/suggest')
+def suggest_books():
+    """Typeahead suggestions for the search box (served from memory)"""
+    query = request.args.get('q', '', type=str)
+    return jsonify({'suggestions': suggest_index.suggest(query)})
 
 @bp.route('/book/<int:book_id>')
+@conditional_get(book_version)
 def book_detail(book_id):
-    book = Book.query.get_or_404(book_id)
-    return render_template('main/book_detail.html', book=book)
+    book = catalog_cache.get_book(book_id)
+    if book is None:
+        abort(404)
+    stock = catalog_cache.stock_levels([book_id]).get(book_id, 0)
+    return render_template('main/book_detail.html', book=book, stock=stock)
+
+@bp.route('/covers/<path:filename>')
+def cover_image(filename):
+    """Stored cover variants; names are content hashes, so they never change"""
+    response = send_from_directory(cover_store.directory, filename, max_age=cover_store.max_age)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
 
 @bp.route('/orders')
 def user_orders():
@@ -45,10 +105,11 @@ def user_orders():
         return redirect(url_for('auth.login'))
     
     user_id = session['user_id']
-    page = request.args.get('page', 1, type=int)
     
-    orders = Order.query.filter_by(user_id=user_id).order_by(Order.created_at.desc()).paginate(
-        page=page, per_page=10, error_out=False
+    orders = keyset_paginate(
+        with_lines(Order.query.filter_by(user_id=user_id)), Order, per_page=10,
+        after=request.args.get('after'), before=request.args.get('before'),
+        count_key=f'orders:user:{user_id}'
     )
     
     return render_template('main/orders.html', orders=orders)
@@ -47,9 +47,18 @@ class Book(db.Model):
     price = db.Column(db.Float, nullable=False)
     description = db.Column(db.Text)
     image_url = db.Column(db.String(500))
+    image_key = db.Column(db.String(64))  # Locally stored cover variants, see utils.cover_images
     stock = db.Column(db.Integer, default=0)
     genre = db.Column(db.Enum(GenreEnum), nullable=False, default=GenreEnum.OTHER, server_default="OTHER")
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)  # Revision stamp for ETags
+
+    __table_args__ = (
+        db.Index('ix_book_created_at', 'created_at'),
+        db.Index('ix_book_updated_at', 'updated_at'),  # Stock stamp, max(updated_at)
+        db.Index('ix_book_genre_created', 'genre', 'created_at'),
+        db.Index('ix_book_title_author', 'title', 'author'),
+    )
     
     # Relationships
     order_items = db.relationship('OrderItem', backref='book', lazy='dynamic')
@@ -65,9 +74,16 @@ class Order(db.Model):
     total_amount = db.Column(db.Float, nullable=False)
     status = db.Column(db.String(20), default='pending')  # pending, paid, shipped, delivered
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_order_created_at', 'created_at'),
+        db.Index('ix_order_user_created', 'user_id', 'created_at'),
+        db.Index('ix_order_status_created', 'status', 'created_at'),
+    )
     
     # Relationships
-    items = db.relationship('OrderItem', backref='order', lazy='dynamic')
+    # A plain list, so listings can eager-load it (see app/utils/order_queries.py)
+    items = db.relationship('OrderItem', backref='order', order_by='OrderItem.id')
     payment = db.relationship('Payment', backref='order', uselist=False)
 
 class OrderItem(db.Model):
@@ -77,6 +93,11 @@ class OrderItem(db.Model):
     quantity = db.Column(db.Integer, nullable=False, default=1)
     price = db.Column(db.Float, nullable=False)  # Price at time of purchase
 
+    __table_args__ = (
+        db.Index('ix_order_item_order_id', 'order_id'),
+        db.Index('ix_order_item_book_id', 'book_id'),
+    )
+
 class Cart(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -84,12 +105,21 @@ class Cart(db.Model):
     quantity = db.Column(db.Integer, nullable=False, default=1)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    # One cart row per user and book
+    __table_args__ = (
+        db.Index('uq_cart_user_book', 'user_id', 'book_id', unique=True),
+    )
+
 class Wishlist(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     book_id = db.Column(db.Integer, db.ForeignKey('book.id'), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        db.Index('uq_wishlist_user_book', 'user_id', 'book_id', unique=True),
+    )
+
 class Payment(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     order_id = db.Column(db.Integer, db.ForeignKey('order.id'), nullable=False)
@@ -98,3 +128,86 @@ class Payment(db.Model):
     amount = db.Column(db.Float, nullable=False)
     status = db.Column(db.String(20), default='pending')  # pending, completed, failed
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_payment_order_id', 'order_id'),
+    )
+
+class CatalogVersion(db.Model):
+    """Single-row generation counter bumped on every catalog write (see utils.catalog_cache)"""
+    id = db.Column(db.Integer, primary_key=True)
+    generation = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class StockReservation(db.Model):
+    """Hold on stock while a checkout is being paid (see utils.reservations)"""
+    id = db.Column(db.Integer, primary_key=True)
+    reference = db.Column(db.String(36), nullable=False)  # One checkout; sent to Stripe as client_reference_id
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    book_id = db.Column(db.Integer, db.ForeignKey('book.id'), nullable=False)
+    quantity = db.Column(db.Integer, nullable=False)
+    price = db.Column(db.Float)  # Unit price charged at checkout
+    status = db.Column(db.String(20), nullable=False, default='active')  # active, converted, released
+    expires_at = db.Column(db.DateTime, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_reservation_book_status_expires', 'book_id', 'status', 'expires_at'),
+        db.Index('ix_reservation_status_expires', 'status', 'expires_at'),
+        db.Index('ix_reservation_user_status', 'user_id', 'status'),
+        db.Index('ix_reservation_reference', 'reference'),
+    )
+
+
+class StripeEvent(db.Model):
+    """Inbox of verified Stripe webhook events, processed by utils.webhook_inbox"""
+    id = db.Column(db.String(255), primary_key=True)  # Stripe event id: redeliveries collapse onto one row
+    type = db.Column(db.String(64), nullable=False)
+    payload = db.Column(db.Text, nullable=False)  # The event's JSON, as delivered
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, processed, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    last_error = db.Column(db.Text)
+    received_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    processed_at = db.Column(db.DateTime)
+
+    __table_args__ = (
+        db.Index('ix_stripe_event_status_next_attempt', 'status', 'next_attempt_at'),
+    )
+
+
+class StockLedger(db.Model):
+    """One row per stock change made through utils.inventory"""
+    id = db.Column(db.Integer, primary_key=True)
+    book_id = db.Column(db.Integer, db.ForeignKey('book.id'), nullable=False)
+    order_id = db.Column(db.Integer, db.ForeignKey('order.id'))
+    change = db.Column(db.Integer, nullable=False)  # Signed: negative takes stock out
+    reason = db.Column(db.String(32), nullable=False)  # order, cancelled, refunded, declined, reinstated
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_stock_ledger_book_created', 'book_id', 'created_at'),
+        db.Index('ix_stock_ledger_order_id', 'order_id'),
+    )
+
+
+class CheckoutSession(db.Model):
+    """Local copy of a Stripe checkout session's state (see utils.checkout_state)"""
+    id = db.Column(db.String(255), primary_key=True)  # Stripe checkout session id
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    reference = db.Column(db.String(36))  # Stock reservation / client_reference_id
+    status = db.Column(db.String(20), nullable=False, default='open')  # open, paid, expired
+    amount_total = db.Column(db.Integer)  # Cents
+    payment_intent = db.Column(db.String(255))
+    order_id = db.Column(db.Integer, db.ForeignKey('order.id'))
+    expires_at = db.Column(db.DateTime)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class StatsCounter(db.Model):
+    """Running totals behind the admin dashboard (see utils.dashboard_stats)"""
+    key = db.Column(db.String(64), primary_key=True)  # books, users:<role>, orders:<status>
+    count = db.Column(db.BigInteger, nullable=False, default=0)
+    amount = db.Column(db.Float, nullable=False, default=0)  # Order totals, for orders:<status>
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
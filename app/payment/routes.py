@@ -1,15 +1,22 @@
 import stripe
-import os
-from flask import render_template, request, redirect, url_for, flash, jsonify, session
+import calendar
+from flask import render_template, request, redirect, url_for, flash, jsonify, session, current_app
 from app.payment import bp
 from app.models import User, Book, Cart, Order, OrderItem, Payment, GenreEnum
 from app import db, scheduler, csrf
 from app.config import Config
+from app.utils.cart_summary import refresh_cart_summary, paid_cart_summary
+from app.utils.cart_service import remove_purchased
+from app.utils.reservations import reserve, convert, release, checkout_lines, ReservationError
+from app.utils import webhook_inbox, checkout_state
+from app.utils.inventory import decrement_stock, restock_orders, InsufficientStock
 from datetime import datetime, timedelta
 
 
 # Configure Stripe
 stripe.api_key = Config.STRIPE_SECRET_KEY
+if Config.STRIPE_API_BASE:
+    stripe.api_base = Config.STRIPE_API_BASE
 
 def login_required(f):
     """Simple login check decorator"""
@@ -32,12 +39,20 @@ def create_checkout_session():
         if not cart_items:
             return jsonify({'error': 'Cart is empty'}), 400
         
-        # Validate stock availability
-        for cart_item, book in cart_items:
-            if book.stock < cart_item.quantity:
-                return jsonify({
-                    'error': f'Insufficient stock for {book.title}. Only {book.stock} available.'
-                }), 400
+        # Double-clicks and refreshes get the open session for the same cart back
+        current_cart_hash = checkout_state.cart_hash(cart_items)
+        reusable = checkout_state.reusable_session(user_id, current_cart_hash)
+        if reusable:
+            return jsonify({'sessionId': reusable})
+        
+        # Hold the stock while the customer pays (released by the sweeper if they don't)
+        try:
+            reference, hold_expires_at = reserve(
+                user_id, {book.id: cart_item.quantity for cart_item, book in cart_items},
+                {book.id: book.price for cart_item, book in cart_items}
+            )
+        except ReservationError as e:
+            return jsonify({'error': str(e)}), 400
         
         # Create line items for Stripe
         line_items = []
@@ -49,22 +64,36 @@ def create_checkout_session():
                         'name': book.title,
                         'description': f'by {book.author}',
                     },
-                    'unit_amount': int(book.price * 100),  # Convert to cents
+                    'unit_amount': int(round(book.price * 100)),  # Convert to cents
                 },
                 'quantity': cart_item.quantity,
             })
         
-        # Create checkout session
-        checkout_session = stripe.checkout.Session.create(
-            payment_method_types=['card'],
-            line_items=line_items,
-            mode='payment',
-            success_url=request.host_url + 'payment/success?session_id={CHECKOUT_SESSION_ID}',
-            cancel_url=request.host_url + 'shop/cart',
-            metadata={
-                'user_id': user_id
-            }
-        )
+        # Create checkout session; it can't be paid after the hold ends
+        # (holds always last longer than Stripe's 30 minute minimum)
+        expires_at = hold_expires_at
+        try:
+            checkout_session = stripe.checkout.Session.create(
+                payment_method_types=['card'],
+                line_items=line_items,
+                mode='payment',
+                success_url=request.host_url + 'payment/success?session_id={CHECKOUT_SESSION_ID}',
+                cancel_url=request.host_url + 'shop/cart',
+                client_reference_id=reference,
+                expires_at=calendar.timegm(expires_at.utctimetuple()),
+                metadata={
+                    'user_id': user_id,
+                    'reservation': reference
+                }
+            )
+        except Exception:
+            release(reference)
+            db.session.commit()
+            raise
+        
+        # Lets the success page confirm the payment without asking Stripe
+        checkout_state.record_created(checkout_session, user_id, reference, expires_at)
+        checkout_state.remember(checkout_session.id, current_cart_hash, hold_expires_at)
         
         return jsonify({'sessionId': checkout_session.id})
         
@@ -79,10 +108,25 @@ def payment_success():
     
     if session_id:
         try:
-            # Retrieve the session from Stripe
-            session_data = stripe.checkout.Session.retrieve(session_id)
+            # The webhook has usually recorded the payment by now; ask Stripe only if not
+            state = checkout_state.wait_until_settled(session_id, session['user_id'])
+            if state is not None and state.status != 'open':
+                payment_status = 'paid' if state.status == 'paid' else 'unpaid'
+            else:
+                session_data = stripe.checkout.Session.retrieve(session_id)
+                payment_status = session_data.payment_status
+                if payment_status == 'paid' and state is not None:
+                    checkout_state.mark(session_id, 'paid', payment_intent=session_data.payment_intent)
+                    db.session.commit()
             
-            if session_data.payment_status == 'paid':
+            if payment_status == 'paid':
+                # The webhook worker turns the checkout into the order and takes
+                # its lines out of the cart; the badge shouldn't wait for it
+                reference = state.reference if state is not None else None
+                if reference and state.order_id is None:
+                    paid_cart_summary({book_id: quantity for book_id, quantity, price in checkout_lines(reference)})
+                else:
+                    refresh_cart_summary()
                 flash('Payment successful! Your order has been placed.', 'success')
             else:
                 flash('Payment verification pending.', 'info')
@@ -95,94 +139,124 @@ def payment_success():
 @csrf.exempt 
 @bp.route('/webhook', methods=['POST'])
 def stripe_webhook():
-    """Handle Stripe webhooks"""
+    """Verify a Stripe webhook and queue it in the event inbox.
+
+    Answers as soon as the event is stored; the inbox worker creates the
+    order in the background, once per event id however often Stripe
+    redelivers it.
+    """
     payload = request.get_data()
     sig_header = request.headers.get('Stripe-Signature')
 
-    print(f"Webhook received - Signature: {sig_header[:20] if sig_header else 'None'}...")
-    print(f"Payload length: {len(payload)}")
-
-    webhook_secret = Config.STRIPE_WEBHOOK_SECRET or os.environ.get('STRIPE_WEBHOOK_SECRET')
-    print(f"Using webhook secret: {webhook_secret[:10] if webhook_secret else 'None'}...")
+    current_app.logger.debug('Webhook received (%d bytes)', len(payload))
     
     try:
         event = stripe.Webhook.construct_event(
             payload, sig_header, Config.STRIPE_WEBHOOK_SECRET
         )
-        print(f"Event type: {event['type']}")
+        current_app.logger.debug('Webhook event %s (%s)', event['id'], event['type'])
     except ValueError as e:
-        print(f"Invalid payload: {e}")
+        current_app.logger.warning('Invalid webhook payload: %s', e)
         return 'Invalid payload', 400
     except stripe.error.SignatureVerificationError as e:
-        print(f"Invalid signature: {e}")
+        current_app.logger.warning('Invalid webhook signature: %s', e)
         return 'Invalid signature', 400
     
-    # Handle checkout session completed
-    if event['type'] == 'checkout.session.completed':
+    try:
+        # Recorded with the inbox row, for the success page
         session_data = event['data']['object']
-        print(f"Processing checkout session: {session_data.get('id')}")
-        try:
-            handle_successful_payment(session_data)
-            print("Payment processed successfully")
-        except Exception as e:
-            print(f"Error in handle_successful_payment: {e}")
-            return 'Processing error', 400
+        if event['type'] == 'checkout.session.completed' and session_data.get('payment_status') == 'paid':
+            checkout_state.mark(session_data['id'], 'paid', payment_intent=session_data.get('payment_intent'))
+        elif event['type'] == 'checkout.session.expired':
+            checkout_state.mark(session_data['id'], 'expired')
+        webhook_inbox.store(event)
+    except Exception:
+        db.session.rollback()
+        current_app.logger.exception('Error storing event %s', event['id'])
+        return 'Storage error', 500  # Stripe retries
     
     return 'Success', 200
 
+@webhook_inbox.handles('checkout.session.expired')
+def handle_expired_checkout(session_data):
+    """Abandoned checkout: give its held stock back right away"""
+    reference = session_data.get('client_reference_id')
+    if reference:
+        release(reference)
+
+@webhook_inbox.handles('checkout.session.completed')
 def handle_successful_payment(session_data):
-    """Process successful payment and create order"""
+    """Create the order for a paid checkout (run by the inbox worker, which commits).
+
+    The order is built from what was paid for: the checkout's holds (books,
+    quantities, prices) and the amount Stripe charged, never from the live
+    cart, which the customer may have changed since. If the books are short
+    (the hold lapsed and they sold out meanwhile) the order is recorded as
+    ``backordered`` without taking stock, for an admin to fill or refund;
+    retrying would not help. Other failures raise so the event is retried.
+    """
+    user_id = int(session_data['metadata']['user_id'])
+    current_app.logger.info('Processing checkout session %s', session_data.get('id'))
+    
+    # A second event for the same payment (e.g. a different event id) is a no-op
+    if Payment.query.filter_by(transaction_id=session_data['payment_intent']).first():
+        return
+    
+    reference = session_data.get('client_reference_id')
+    lines = checkout_lines(reference) if reference else []
+    if not lines:
+        raise ValueError(f"No checkout lines recorded for reference {reference}")
+    
+    # What Stripe charged (cents)
+    amount_total = session_data.get('amount_total')
+    total_amount = amount_total / 100 if amount_total is not None else round(
+        sum(quantity * price for book_id, quantity, price in lines), 2
+    )
+    
+    # Create order with 'in_progress' status
+    order = Order(
+        user_id=user_id,
+        total_amount=total_amount,
+        status='in_progress'  # Orders start as 'in_progress'
+    )
+    db.session.add(order)
+    db.session.flush()
+    
+    # Create order items
+    db.session.add_all([
+        OrderItem(order_id=order.id, book_id=book_id, quantity=quantity, price=price)
+        for book_id, quantity, price in lines
+    ])
+    
+    # Take the stock with one guarded UPDATE; a shortfall writes no stock at all
+    quantities = {book_id: quantity for book_id, quantity, price in lines}
     try:
-        user_id = int(session_data['metadata']['user_id'])
-        
-        # Get cart items
-        cart_items = db.session.query(Cart, Book).join(Book).filter(Cart.user_id == user_id).all()
-        
-        if not cart_items:
-            return
-        
-        # Calculate total
-        total_amount = sum(cart_item.quantity * book.price for cart_item, book in cart_items)
-        
-        # Create order with 'in_progress' status
-        order = Order(
-            user_id=user_id,
-            total_amount=total_amount,
-            status='in_progress'  # Orders start as 'in_progress'
-        )
-        db.session.add(order)
-        db.session.flush()
-        
-        # Create order items and update stock
-        for cart_item, book in cart_items:
-            order_item = OrderItem(
-                order_id=order.id,
-                book_id=book.id,
-                quantity=cart_item.quantity,
-                price=book.price
-            )
-            db.session.add(order_item)
-            book.stock -= cart_item.quantity
-        
-        # Create payment record
-        payment = Payment(
-            order_id=order.id,
-            payment_method='stripe',
-            transaction_id=session_data['payment_intent'],
-            amount=total_amount,
-            status='completed'
-        )
-        db.session.add(payment)
-        
-        # Clear cart
-        Cart.query.filter_by(user_id=user_id).delete()
-        
-        db.session.commit()
-        print(f"✅ Order {order.id} created successfully - Status: in_progress")
-        
-    except Exception as e:
-        db.session.rollback()
-        print(f"❌ Error processing payment: {e}")
+        decrement_stock(quantities, order_id=order.id)
+    except InsufficientStock as e:
+        order.status = 'backordered'
+        current_app.logger.error('Order %s (checkout %s) was paid but is backordered: %s',
+                                 order.id, session_data.get('id'), e)
+    
+    # Create payment record
+    payment = Payment(
+        order_id=order.id,
+        payment_method='stripe',
+        transaction_id=session_data['payment_intent'],
+        amount=total_amount,
+        status='completed'
+    )
+    db.session.add(payment)
+    
+    # The held stock is now taken by the order
+    if not convert(reference) and order.status != 'backordered':
+        current_app.logger.warning('Reservation %s had already expired; stock decremented anyway', reference)
+    
+    # Only what was bought leaves the cart
+    remove_purchased(user_id, quantities)
+    
+    checkout_state.mark(session_data['id'], 'paid', order_id=order.id)
+    
+    current_app.logger.info('Order %s created for checkout %s (%s)', order.id, session_data.get('id'), order.status)
 
 
 @bp.route('/order-action/<int:order_id>', methods=['POST'])
@@ -215,9 +289,7 @@ def handle_order_action(order_id):
         order.status = 'cancelled'
         
         # Restore stock
-        for order_item in order.items:
-            book = Book.query.get(order_item.book_id)
-            book.stock += order_item.quantity
+        restock_orders([order.id], 'declined')
         
         db.session.commit()
         
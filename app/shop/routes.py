@@ -2,6 +2,15 @@ from flask import render_template, request, redirect, url_for, flash, jsonify, s
 from app.shop import bp
 from app.models import User, Book, Cart, Wishlist, GenreEnum
 from app import db
+from app.utils.cart_summary import (
+    get_cart_summary, set_cart_summary, adjust_cart_summary, clear_cart_summary
+)
+from app.utils.catalog_cache import catalog_cache
+from app.utils.cart_service import add_item, apply_changes, CartError
+from app.utils.guest_cart import (
+    guest_cart_lines, guest_cart_summary, add_guest_item, apply_guest_changes, clear_guest_cart
+)
+from app.utils.reservations import available_stock
 from sqlalchemy import and_
 
 def login_required(f):
@@ -14,58 +23,58 @@ def login_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+@bp.app_context_processor
+def inject_cart_summary():
+    """Navbar cart badge, rendered into every page from the session"""
+    return {'cart_summary': get_cart_summary()}
+
 @bp.route('/cart')
-@login_required
 def view_cart():
-    """Display user's shopping cart"""
-    user_id = session['user_id']
-    cart_items = db.session.query(Cart, Book).join(Book).filter(Cart.user_id == user_id).all()
+    """Display the shopping cart (a guest's comes from the cart cookie)"""
+    if 'user_id' not in session:
+        cart_items = guest_cart_lines()
+    else:
+        user_id = session['user_id']
+        cart_items = db.session.query(Cart, Book).join(Book).filter(Cart.user_id == user_id).all()
+        set_cart_summary(cart_items)  # Resync with current prices
     
     total = sum(item.quantity * book.price for item, book in cart_items)
     
     return render_template('shop/cart.html', cart_items=cart_items, total=total)
 
 @bp.route('/add-to-cart/<int:book_id>', methods=['POST'])
-@login_required
 def add_to_cart(book_id):
     """Add book to cart with AJAX"""
-    user_id = session['user_id']
-    quantity = int(request.json.get('quantity', 1))
-    
-    # Get book and check stock
-    book = Book.query.get_or_404(book_id)
-    if book.stock < quantity:
-        return jsonify({
-            'success': False, 
-            'message': f'Only {book.stock} items available in stock'
-        }), 400
-    
-    # Check if item already exists in cart
-    cart_item = Cart.query.filter_by(user_id=user_id, book_id=book_id).first()
-    
-    if cart_item:
-        # Update existing cart item
-        new_quantity = cart_item.quantity + quantity
-        if new_quantity > book.stock:
-            return jsonify({
-                'success': False,
-                'message': f'Cannot add {quantity} more. Only {book.stock - cart_item.quantity} items available'
-            }), 400
-        cart_item.quantity = new_quantity
+    try:
+        quantity = int(request.json.get('quantity', 1))
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'message': 'Invalid quantity'}), 400
+    
+    if 'user_id' not in session:
+        # Guests: kept in the signed cart cookie, no database write
+        try:
+            line_quantity, price, created = add_guest_item(book_id, quantity)
+        except CartError as e:
+            return jsonify({'success': False, 'message': str(e)}), e.status
+        summary = guest_cart_summary()
     else:
-        # Create new cart item
-        cart_item = Cart(user_id=user_id, book_id=book_id, quantity=quantity)
-        db.session.add(cart_item)
-    
-    db.session.commit()
+        # One INSERT ... ON CONFLICT DO UPDATE, guarded by stock
+        try:
+            line_quantity, price, created = add_item(session['user_id'], book_id, quantity)
+        except CartError as e:
+            db.session.rollback()
+            return jsonify({'success': False, 'message': str(e)}), e.status
+        db.session.commit()
+        summary = adjust_cart_summary(1 if created else 0, quantity * price)
     
-    # Get cart count for UI update
-    cart_count = Cart.query.filter_by(user_id=user_id).count()
+    book = catalog_cache.get_book(book_id)
     
     return jsonify({
         'success': True,
         'message': f'{book.title} added to cart',
-        'cart_count': cart_count
+        'quantity': line_quantity,
+        'cart_count': summary['count'],
+        'cart_total': summary['total']
     })
 
 @bp.route('/update-cart/<int:cart_id>', methods=['POST'])
@@ -81,7 +90,8 @@ def update_cart(cart_id):
     if quantity <= 0:
         db.session.delete(cart_item)
         db.session.commit()
-        return jsonify({'success': True, 'message': 'Item removed from cart'})
+        summary = adjust_cart_summary(-1, -cart_item.quantity * book.price)
+        return jsonify({'success': True, 'message': 'Item removed from cart', 'cart_count': summary['count']})
     
     if quantity > book.stock:
         return jsonify({
@@ -89,22 +99,52 @@ def update_cart(cart_id):
             'message': f'Only {book.stock} items available'
         }), 400
     
+    previous_quantity = cart_item.quantity
     cart_item.quantity = quantity
     db.session.commit()
     
+    summary = adjust_cart_summary(0, (quantity - previous_quantity) * book.price)
+    
+    return jsonify({
+        'success': True,
+        'message': 'Cart updated',
+        'new_total': quantity * book.price,
+        'cart_count': summary['count']
+    })
+
+@bp.route('/cart/batch', methods=['POST'])
+def update_cart_batch():
+    """Apply several quantity changes/removals in one request and one commit"""
+    operations = (request.get_json(silent=True) or {}).get('operations')
+    
+    if 'user_id' not in session:
+        try:
+            lines, removed, amount = apply_guest_changes(operations)
+        except CartError as e:
+            return jsonify({'success': False, 'message': str(e)}), e.status
+        summary = guest_cart_summary()
+    else:
+        try:
+            lines, removed, amount = apply_changes(session['user_id'], operations)
+        except CartError as e:
+            db.session.rollback()
+            return jsonify({'success': False, 'message': str(e)}), e.status
+        db.session.commit()
+        summary = adjust_cart_summary(-removed, amount)
+    
     return jsonify({
         'success': True,
         'message': 'Cart updated',
-        'new_total': quantity * book.price
+        'lines': lines,
+        'cart_count': summary['count'],
+        'cart_total': summary['total']
     })
 
 @bp.route('/cart-count')
-@login_required
 def cart_count():
-    """Get cart item count for navbar"""
-    user_id = session['user_id']
-    count = Cart.query.filter_by(user_id=user_id).count()
-    return jsonify({'count': count})
+    """Get cart item count for navbar (also rendered into every page)"""
+    summary = get_cart_summary()
+    return jsonify({'count': summary['count'], 'total': summary['total']})
 
 
 @bp.route('/remove-from-cart/<int:cart_id>', methods=['POST'])
@@ -117,24 +157,28 @@ def remove_from_cart(cart_id):
     db.session.delete(cart_item)
     db.session.commit()
     
-    # Get updated cart count
-    cart_count = Cart.query.filter_by(user_id=user_id).count()
+    book = catalog_cache.get_book(cart_item.book_id)
+    summary = adjust_cart_summary(-1, -cart_item.quantity * book.price if book else 0)
     
     return jsonify({
         'success': True,
         'message': 'Item removed from cart',
-        'cart_count': cart_count
+        'cart_count': summary['count']
     })
 
 @bp.route('/clear-cart', methods=['POST'])
-@login_required
 def clear_cart():
     """Clear all items from cart"""
+    if 'user_id' not in session:
+        clear_guest_cart()
+        return jsonify({'success': True, 'message': 'Cart cleared', 'cart_count': 0})
+    
     user_id = session['user_id']
     Cart.query.filter_by(user_id=user_id).delete()
     db.session.commit()
+    clear_cart_summary()
     
-    return jsonify({'success': True, 'message': 'Cart cleared'})
+    return jsonify({'success': True, 'message': 'Cart cleared', 'cart_count': 0})
 
 @bp.route('/wishlist')
 @login_required
@@ -183,10 +227,19 @@ def checkout():
     cart_items = db.session.query(Cart, Book).join(Book).filter(Cart.user_id == user_id).all()
     
     if not cart_items:
+        set_cart_summary(cart_items)
         flash('Your cart is empty', 'warning')
         return redirect(url_for('shop.view_cart'))
     
+    # Stock held by other customers' checkouts is not available
+    available = available_stock([book.id for item, book in cart_items], exclude_user_id=user_id)
+    for item, book in cart_items:
+        if available.get(book.id, 0) < item.quantity:
+            flash(f'Only {max(available.get(book.id, 0), 0)} of "{book.title}" available right now', 'warning')
+            return redirect(url_for('shop.view_cart'))
+    
     # Calculate total
     subtotal = sum(item.quantity * book.price for item, book in cart_items)
+    set_cart_summary(cart_items)
     
     return render_template('shop/checkout.html', cart_items=cart_items, subtotal=subtotal)
@@ -0,0 +1,257 @@
+// Cart, wishlist and search helpers shared by every page
+
+function getCSRFToken() {
+    return document.querySelector('meta[name=csrf-token]')?.getAttribute('content') || '';
+}
+
+function isLoggedIn() {
+    return document.querySelector('meta[name=user-logged-in]')?.getAttribute('content') === 'true';
+}
+
+// Global functions for cart and wishlist
+function addToCart(bookId, quantity = 1) {
+    // Guests can shop too: their cart is kept in a cookie until they login
+    fetch(`/shop/add-to-cart/${bookId}`, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+            'X-CSRFToken': getCSRFToken()
+        },
+        body: JSON.stringify({quantity: quantity})
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.success) {
+            showAlert(data.message, 'success');
+            updateCartCount(data.cart_count);
+        } else {
+            showAlert(data.message, 'danger');
+        }
+    })
+    .catch(error => {
+        showAlert('Error adding to cart', 'danger');
+    });
+}
+
+function addToWishlist(bookId) {
+    if (!isLoggedIn()) {
+        showAlert('Please login to add items to wishlist', 'warning');
+        return;
+    }
+
+    fetch(`/shop/add-to-wishlist/${bookId}`, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+            'X-CSRFToken': getCSRFToken()
+        }
+    })
+    .then(response => response.json())
+    .then(data => {
+        showAlert(data.message, data.success ? 'success' : 'warning');
+    })
+    .catch(error => {
+        showAlert('Error adding to wishlist', 'danger');
+    });
+}
+
+function updateCartCount(count) {
+    const cartBadge = document.getElementById('cart-count');
+    if (cartBadge) {
+        cartBadge.textContent = count;
+        cartBadge.style.display = count > 0 ? 'inline' : 'none';
+    }
+}
+
+function showAlert(message, type) {
+    const alertDiv = document.createElement('div');
+    alertDiv.className = `alert alert-${type} alert-dismissible fade show position-fixed`;
+    alertDiv.style.top = '80px';
+    alertDiv.style.right = '20px';
+    alertDiv.style.zIndex = '9999';
+    alertDiv.style.minWidth = '300px';
+    alertDiv.innerHTML = `
+        ${message}
+        <button type="button" class="btn-close" data-bs-dismiss="alert"></button>
+    `;
+
+    document.body.appendChild(alertDiv);
+
+    // Auto remove after 3 seconds
+    setTimeout(() => {
+        if (alertDiv.parentNode) {
+            alertDiv.remove();
+        }
+    }, 3000);
+}
+
+// Cart page: quantity edits are queued and sent together to /shop/cart/batch
+const pendingCartChanges = new Map();
+let cartFlushTimer = null;
+
+function changeQuantity(cartId, delta) {
+    const input = document.getElementById(`quantity-${cartId}`);
+    const quantity = parseInt(input.value, 10) + delta;
+    if (quantity <= 0) {
+        removeFromCart(cartId);
+        return;
+    }
+    updateQuantity(cartId, quantity);
+}
+
+function updateQuantity(cartId, newQuantity) {
+    if (newQuantity <= 0) {
+        removeFromCart(cartId);
+        return;
+    }
+    queueCartChange(cartId, newQuantity);
+}
+
+function removeFromCart(cartId) {
+    if (confirm('Remove this item from cart?')) {
+        const row = document.getElementById(`cart-row-${cartId}`);
+        if (row) {
+            row.style.display = 'none';
+        }
+        queueCartChange(cartId, 0);
+        flushCartChanges();
+    }
+}
+
+function queueCartChange(cartId, quantity) {
+    const input = document.getElementById(`quantity-${cartId}`);
+    if (input) {
+        input.value = quantity;
+    }
+    pendingCartChanges.set(cartId, quantity);
+    refreshCartTotals();
+
+    // Rapid clicks, on any number of rows, go out as one request
+    clearTimeout(cartFlushTimer);
+    cartFlushTimer = setTimeout(flushCartChanges, 600);
+}
+
+function refreshCartTotals() {
+    let total = 0;
+    document.querySelectorAll('#cart-items tr[data-price]').forEach(row => {
+        const cartId = row.dataset.cartId;
+        const quantity = parseInt(document.getElementById(`quantity-${cartId}`).value, 10);
+        const lineTotal = quantity * parseFloat(row.dataset.price);
+        document.getElementById(`item-total-${cartId}`).textContent = `$${lineTotal.toFixed(2)}`;
+        total += lineTotal;
+    });
+    const cartTotal = document.getElementById('cart-total');
+    if (cartTotal) {
+        cartTotal.textContent = total.toFixed(2);
+    }
+}
+
+function flushCartChanges(keepalive = false) {
+    clearTimeout(cartFlushTimer);
+    if (!pendingCartChanges.size) {
+        return Promise.resolve(true);
+    }
+
+    const operations = Array.from(pendingCartChanges, ([cartId, quantity]) => ({cart_id: cartId, quantity: quantity}));
+    pendingCartChanges.clear();
+
+    return fetch('/shop/cart/batch', {
+        method: 'POST',
+        keepalive: keepalive,
+        headers: {
+            'Content-Type': 'application/json',
+            'X-CSRFToken': getCSRFToken()
+        },
+        body: JSON.stringify({operations: operations})
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (!data.success) {
+            // Nothing was applied; show the cart as it really is
+            showAlert(data.message, 'danger');
+            setTimeout(() => location.reload(), 1500);
+            return false;
+        }
+        updateCartCount(data.cart_count);
+        data.lines.filter(line => line.quantity === 0).forEach(line => {
+            document.getElementById(`cart-row-${line.cart_id}`)?.remove();
+        });
+        if (!document.querySelector('#cart-items tr')) {
+            location.reload(); // Show the empty cart message
+        }
+        return true;
+    })
+    .catch(error => {
+        showAlert('Error updating cart', 'danger');
+        return false;
+    });
+}
+
+// Save queued edits before checkout or leaving the page
+(function() {
+    const checkoutLink = document.getElementById('checkout-link');
+    if (checkoutLink) {
+        checkoutLink.addEventListener('click', function(e) {
+            if (!pendingCartChanges.size) return;
+            e.preventDefault();
+            const href = checkoutLink.href;
+            flushCartChanges().then(saved => {
+                if (saved) {
+                    location.href = href;
+                }
+            });
+        });
+    }
+    window.addEventListener('pagehide', () => flushCartChanges(true));
+})();
+
+function clearCart() {
+    if (confirm('Clear all items from cart?')) {
+        fetch('/shop/clear-cart', {
+            method: 'POST',
+            headers: {
+                'X-CSRFToken': getCSRFToken()
+            }
+        })
+        .then(response => response.json())
+        .then(data => {
+            if (data.success) {
+                location.reload();
+            }
+        });
+    }
+}
+
+// Typeahead suggestions for the navbar search box
+(function() {
+    const searchInput = document.getElementById('search-input');
+    const suggestionList = document.getElementById('search-suggestions');
+    if (!searchInput || !suggestionList) return;
+
+    let latestQuery = '';
+    searchInput.addEventListener('input', function() {
+        const query = searchInput.value.trim();
+        latestQuery = query;
+        if (query.length < 2) {
+            suggestionList.innerHTML = '';
+            return;
+        }
+
+        fetch(`/books/suggest?q=${encodeURIComponent(query)}`)
+            .then(response => response.json())
+            .then(data => {
+                // Ignore responses for older keystrokes
+                if (query !== latestQuery) return;
+                suggestionList.innerHTML = '';
+                data.suggestions.forEach(book => {
+                    const option = document.createElement('option');
+                    option.value = book.title;
+                    option.label = `by ${book.author}`;
+                    suggestionList.appendChild(option);
+                });
+            })
+            .catch(() => {
+                // Suggestions are best effort
+            });
+    });
+})();
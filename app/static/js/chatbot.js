@@ -0,0 +1,210 @@
+// Taylor chatbot widget (home page)
+
+let chatOpen = false;
+let isTyping = false;
+
+document.addEventListener('DOMContentLoaded', function() {
+    document.getElementById('chat-input').addEventListener('keypress', function(e) {
+        if (e.key === 'Enter' && !e.shiftKey) {
+            e.preventDefault();
+            sendMessage();
+        }
+    });
+    scrollToBottom();
+});
+
+function toggleChat() {
+    const chatWindow = document.getElementById('chat-window');
+    const chatToggle = document.getElementById('chat-toggle');
+    
+    chatOpen = !chatOpen;
+    
+    if (chatOpen) {
+        chatWindow.classList.add('show');
+        chatToggle.style.display = 'none';
+        document.getElementById('chat-input').focus();
+    } else {
+        chatWindow.classList.remove('show');
+        chatToggle.style.display = 'block';
+    }
+}
+
+function minimizeChat() {
+    toggleChat();
+}
+
+function sendMessage() {
+    const input = document.getElementById('chat-input');
+    const message = input.value.trim();
+    
+    if (!message || isTyping) return;
+    
+    addMessage(message, 'user');
+    input.value = '';
+    
+    showTyping();
+    
+    fetch('/chatbot/api/message', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+            'X-CSRFToken': getCSRFToken()
+        },
+        body: JSON.stringify({ message: message })
+    })
+    .then(response => response.json())
+    .then(data => {
+        hideTyping();
+        
+        if (data.success) {
+            const response = data.response;
+            
+            if (response.show_email_input) {
+                showPasswordResetModal();
+            } else {
+                addMessage(response.message, 'bot');
+            }
+        } else {
+            addMessage('Sorry, I encountered an error. Please try again.', 'bot');
+        }
+    })
+    .catch(error => {
+        hideTyping();
+        addMessage('Sorry, I encountered an error. Please try again.', 'bot');
+        console.error('Chat error:', error);
+    });
+}
+
+function sendSuggestion(message) {
+    document.getElementById('chat-input').value = message;
+    sendMessage();
+}
+
+function addMessage(message, sender) {
+    const messagesContainer = document.getElementById('chat-messages');
+    const messageDiv = document.createElement('div');
+    messageDiv.className = `message ${sender}-message`;
+    
+    const avatar = document.createElement('div');
+    avatar.className = 'message-avatar';
+    avatar.innerHTML = sender === 'bot' ? '<i class="fas fa-robot"></i>' : '<i class="fas fa-user"></i>';
+    
+    const content = document.createElement('div');
+    content.className = 'message-content';
+    
+    const formattedMessage = formatMessage(message);
+    content.innerHTML = formattedMessage;
+    
+    const time = document.createElement('div');
+    time.className = 'message-time';
+    time.textContent = new Date().toLocaleTimeString([], { hour: '2-digit', minute: '2-digit' });
+    
+    messageDiv.appendChild(avatar);
+    messageDiv.appendChild(content);
+    messageDiv.appendChild(time);
+    
+    messagesContainer.appendChild(messageDiv);
+    scrollToBottom();
+}
+
+function formatMessage(message) {
+    return message
+        .replace(/\*\*(.*?)\*\*/g, '<strong>$1</strong>')
+        .replace(/\n/g, '<br>')
+        .replace(/• /g, '• ');
+}
+
+function showTyping() {
+    isTyping = true;
+    const messagesContainer = document.getElementById('chat-messages');
+    
+    const typingDiv = document.createElement('div');
+    typingDiv.id = 'typing-indicator';
+    typingDiv.className = 'message bot-message';
+    typingDiv.innerHTML = `
+        <div class="message-avatar">
+            <i class="fas fa-robot"></i>
+        </div>
+        <div class="message-content">
+            <div class="typing-indicator">
+                <div class="typing-dot"></div>
+                <div class="typing-dot"></div>
+                <div class="typing-dot"></div>
+            </div>
+        </div>
+    `;
+    
+    messagesContainer.appendChild(typingDiv);
+    scrollToBottom();
+}
+
+function hideTyping() {
+    isTyping = false;
+    const typingIndicator = document.getElementById('typing-indicator');
+    if (typingIndicator) {
+        typingIndicator.remove();
+    }
+}
+
+function scrollToBottom() {
+    const messagesContainer = document.getElementById('chat-messages');
+    messagesContainer.scrollTop = messagesContainer.scrollHeight;
+}
+
+function showPasswordResetModal() {
+    document.getElementById('password-reset-modal').style.display = 'flex';
+}
+
+function closeResetModal() {
+    document.getElementById('password-reset-modal').style.display = 'none';
+    document.getElementById('reset-email').value = '';
+}
+
+function sendResetEmail() {
+    const email = document.getElementById('reset-email').value.trim();
+    
+    if (!email) {
+        alert('Please enter your email address');
+        return;
+    }
+    
+    const button = event.target;
+    button.disabled = true;
+    button.textContent = 'Sending...';
+    
+    fetch('/chatbot/api/password-reset', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+            'X-CSRFToken': getCSRFToken()
+        },
+        body: JSON.stringify({ email: email })
+    })
+    .then(response => response.json())
+    .then(data => {
+        closeResetModal();
+        addMessage(data.message, 'bot');
+    })
+    .catch(error => {
+        addMessage('Failed to send reset email. Please try again.', 'bot');
+        console.error('Reset email error:', error);
+    })
+    .finally(() => {
+        button.disabled = false;
+        button.textContent = 'Send Reset Link';
+    });
+}
+
+document.addEventListener('click', function(event) {
+    const chatWidget = document.getElementById('chatbot-widget');
+    
+    if (chatOpen && !chatWidget.contains(event.target)) {
+        if (!document.getElementById('password-reset-modal').contains(event.target)) {
+            minimizeChat();
+        }
+    }
+});
+
+document.getElementById('chatbot-widget').addEventListener('click', function(event) {
+    event.stopPropagation();
+});
@@ -28,39 +28,19 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     }
 
-   // Add loading state to buttons WITHOUT preventing form submission
-document.querySelectorAll('form').forEach(form => {
-    form.addEventListener('submit', function() {
-        const submitBtn = form.querySelector('button[type="submit"]');
-        if (submitBtn) {
-            submitBtn.innerHTML = '<span class="spinner-border spinner-border-sm me-2" role="status"></span>Loading...';
-            submitBtn.disabled = true;
-        }
+    // Add loading state to buttons WITHOUT preventing form submission
+    document.querySelectorAll('form').forEach(form => {
+        form.addEventListener('submit', function(e) {
+            if (e.defaultPrevented) return;
+            const submitBtn = form.querySelector('button[type="submit"]');
+            if (submitBtn) {
+                submitBtn.innerHTML = '<span class="spinner-border spinner-border-sm me-2" role="status"></span>Loading...';
+                submitBtn.disabled = true;
+            }
+        });
     });
 });
 
-
-// Utility functions
-function showAlert(message, type = 'info') {
-    const alertContainer = document.createElement('div');
-    alertContainer.innerHTML = `
-        <div class="alert alert-${type} alert-dismissible fade show" role="alert">
-            ${message}
-            <button type="button" class="btn-close" data-bs-dismiss="alert"></button>
-        </div>
-    `;
-    
-    const container = document.querySelector('.container');
-    container.insertBefore(alertContainer, container.firstChild);
-    
-    // Auto-hide after 5 seconds
-    setTimeout(() => {
-        const alert = alertContainer.querySelector('.alert');
-        const bsAlert = new bootstrap.Alert(alert);
-        bsAlert.close();
-    }, 5000);
-}
-
 // Form validation helpers
 function validateEmail(email) {
     const re = /^[^\s@]+@[^\s@]+\.[^\s@]+$/;
@@ -70,14 +50,3 @@ function validateEmail(email) {
 function validatePassword(password) {
     return password.length >= 6;
 }
-
-// Cart functions (placeholder for future implementation)
-function addToCart(bookId, quantity = 1) {
-    // TODO: Implement add to cart functionality
-    showAlert('Added to cart!', 'success');
-}
-
-function addToWishlist(bookId) {
-    // TODO: Implement add to wishlist functionality
-    showAlert('Added to wishlist!', 'success');
-}
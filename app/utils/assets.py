@@ -0,0 +1,156 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import tempfile
+import click
+from flask import request, send_from_directory, url_for
+from flask.cli import with_appcontext
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:  # .br variants are skipped without the Brotli package
+    brotli = None
+
+
+# Bundle name -> source files under app/static, concatenated in order
+BUNDLES = {
+    'app.css': ['css/custom.css'],
+    'app.js': ['js/main.js', 'js/cart.js'],
+    'chatbot.css': ['css/chatbot.css'],
+    'chatbot.js': ['js/chatbot.js'],
+}
+
+MANIFEST = 'manifest.json'
+
+# Preferred first
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+
+
+class AssetPipeline:
+    """Fingerprinted, precompressed CSS/JS bundles.
+
+    ``build()`` concatenates each bundle in ``BUNDLES``, writes it as
+    ``<name>.<content hash>.<ext>`` next to gzip (and, if available, brotli)
+    copies, and records the names in a manifest. Templates link bundles with
+    ``asset_url('app.js')``; because a name changes whenever the content does,
+    ``/assets/...`` responses are cached for a year as ``immutable`` and the
+    precompressed file matching the request's Accept-Encoding is sent as is.
+    """
+
+    def __init__(self):
+        self.static_folder = None
+        self.output_dir = None
+        self.max_age = 365 * 24 * 3600
+        self.manifest = {}
+
+    def init_app(self, app):
+        self.static_folder = app.static_folder
+        self.output_dir = app.config.get('ASSETS_OUTPUT_DIR') or os.path.join(app.static_folder, 'dist')
+        self.max_age = app.config.get('ASSETS_MAX_AGE', self.max_age)
+
+        # Keeps development (and a deploy that skipped `flask assets build`) working
+        if self._stale():
+            self.build()
+        else:
+            self.load()
+
+        app.add_url_rule('/assets/<path:filename>', 'assets', self.serve)
+        app.add_template_global(asset_url)
+        app.cli.add_command(assets_cli)
+
+    def load(self):
+        with open(os.path.join(self.output_dir, MANIFEST)) as f:
+            self.manifest = json.load(f)
+
+    def build(self):
+        """Write every bundle and its compressed variants, then the manifest"""
+        os.makedirs(self.output_dir, exist_ok=True)
+        manifest = {}
+        for name, sources in BUNDLES.items():
+            content = b'\n'.join(self._read(source) for source in sources)
+            digest = hashlib.sha256(content).hexdigest()[:12]
+            base, ext = os.path.splitext(name)
+            hashed = f'{base}.{digest}{ext}'
+
+            path = os.path.join(self.output_dir, hashed)
+            if not os.path.exists(path):
+                self._write(path + '.gz', gzip.compress(content, compresslevel=9, mtime=0))
+                if brotli is not None:
+                    self._write(path + '.br', brotli.compress(content, quality=11))
+                # Written last: its presence means the variants are complete
+                self._write(path, content)
+            manifest[name] = hashed
+
+        self._write(os.path.join(self.output_dir, MANIFEST), json.dumps(manifest, indent=2).encode())
+        self.manifest = manifest
+        return manifest
+
+    def serve(self, filename):
+        mimetype = mimetypes.guess_type(filename)[0]
+        for encoding, suffix in ENCODINGS:
+            path = safe_join(self.output_dir, filename + suffix)
+            if request.accept_encodings[encoding] and path and os.path.isfile(path):
+                response = send_from_directory(self.output_dir, filename + suffix,
+                                               mimetype=mimetype, max_age=self.max_age)
+                response.headers['Content-Encoding'] = encoding
+                break
+        else:
+            response = send_from_directory(self.output_dir, filename, max_age=self.max_age)
+
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        response.vary.add('Accept-Encoding')
+        return response
+
+    def _stale(self):
+        manifest_path = os.path.join(self.output_dir, MANIFEST)
+        if not os.path.exists(manifest_path):
+            return True
+        built_at = os.path.getmtime(manifest_path)
+        return any(
+            os.path.getmtime(os.path.join(self.static_folder, source)) > built_at
+            for sources in BUNDLES.values() for source in sources
+        )
+
+    def _read(self, source):
+        with open(os.path.join(self.static_folder, source), 'rb') as f:
+            return f.read().rstrip(b'\n') + b'\n'
+
+    def _write(self, path, data):
+        # Temp file + rename, so concurrent workers never serve a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=self.output_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, path)
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+
+
+def asset_url(filename):
+    """Fingerprinted URL of a bundle; other files fall back to the static URL"""
+    hashed = assets.manifest.get(filename)
+    if hashed is None:
+        return url_for('static', filename=filename)
+    return url_for('assets', filename=hashed)
+
+
+@click.group('assets')
+def assets_cli():
+    """Static asset bundles"""
+
+
+@assets_cli.command('build')
+@with_appcontext
+def build_command():
+    """Build fingerprinted, precompressed CSS/JS bundles"""
+    for name, hashed in assets.build().items():
+        click.echo(f'{name} -> {hashed}')
+
+
+assets = AssetPipeline()
@@ -0,0 +1,187 @@
+from datetime import datetime
+from sqlalchemy import select, literal, literal_column, update, delete, case, Integer
+from sqlalchemy.dialects import postgresql, sqlite
+from app import db
+from app.models import Book, Cart
+
+
+class CartError(ValueError):
+    """A cart write that was refused; ``status`` is the HTTP status to answer with"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def _insert():
+    if db.engine.dialect.name == 'postgresql':
+        return postgresql.insert(Cart)
+    return sqlite.insert(Cart)
+
+
+def add_item(user_id, book_id, quantity):
+    """Add ``quantity`` of a book to the user's cart in a single statement.
+
+    ``INSERT ... SELECT FROM book WHERE stock >= quantity ON CONFLICT
+    (user_id, book_id) DO UPDATE ... WHERE new quantity <= stock`` either
+    creates the line or bumps the existing one, atomically and only within
+    the available stock, so concurrent adds can neither duplicate the line
+    nor overshoot stock. Returns ``(line quantity, book price, created)``;
+    raises CartError when nothing was written. Does not commit.
+    """
+    if quantity < 1:
+        raise CartError('Quantity must be at least 1')
+
+    book_stock = select(Book.stock).where(Book.id == book_id).scalar_subquery()
+    book_price = select(Book.price).where(Book.id == book_id).scalar_subquery()
+
+    source = select(
+        literal(user_id), Book.id, literal(quantity), literal(datetime.utcnow())
+    ).where(Book.id == book_id, Book.stock >= quantity)
+
+    statement = _insert().from_select(['user_id', 'book_id', 'quantity', 'created_at'], source)
+    statement = statement.on_conflict_do_update(
+        index_elements=['user_id', 'book_id'],
+        set_={'quantity': Cart.quantity + statement.excluded.quantity},
+        where=Cart.quantity + statement.excluded.quantity <= book_stock,
+    ).returning(Cart.quantity, book_price)
+
+    row = db.session.execute(statement).first()
+    if row is None:
+        raise _refusal(user_id, book_id, quantity)
+
+    new_quantity, price = row
+    # An update always ends above the requested quantity
+    return new_quantity, price, new_quantity == quantity
+
+
+def _refusal(user_id, book_id, quantity):
+    """Explain why add_item wrote nothing (only runs on the failure path)"""
+    stock = db.session.query(Book.stock).filter(Book.id == book_id).scalar()
+    if stock is None:
+        return CartError('Book not found', status=404)
+
+    in_cart = db.session.query(Cart.quantity).filter_by(user_id=user_id, book_id=book_id).scalar() or 0
+    if in_cart:
+        return CartError(f'Cannot add {quantity} more. Only {max(stock - in_cart, 0)} items available')
+    return CartError(f'Only {stock} items available in stock')
+
+
+def apply_changes(user_id, operations):
+    """Set the quantities of several cart lines in one transaction.
+
+    ``operations`` is a list of ``{'cart_id': int, 'quantity': int}``; a
+    quantity of 0 removes the line and a later entry for the same line wins.
+    All lines and their stock are read with one query and every change is
+    validated before anything is written, so the batch applies completely or
+    not at all. Returns ``(lines, removed, amount)``: the updated
+    ``{'cart_id', 'quantity', 'line_total'}`` rows, how many lines were
+    removed and the change in cart total. Does not commit.
+    """
+    quantities = parse_changes(operations)
+
+    rows = db.session.query(
+        Cart.id, Cart.quantity, Book.title, Book.stock, Book.price
+    ).join(Book, Book.id == Cart.book_id).filter(
+        Cart.user_id == user_id, Cart.id.in_(quantities)
+    ).all()
+    if len(rows) != len(quantities):
+        raise CartError('Some cart items no longer exist', status=404)
+
+    errors = [
+        f'Only {stock} of "{title}" available'
+        for cart_id, current, title, stock, price in rows
+        if quantities[cart_id] > stock
+    ]
+    if errors:
+        raise CartError('; '.join(errors))
+
+    lines = []
+    updates = []
+    removed_ids = []
+    amount = 0.0
+    for cart_id, current, title, stock, price in rows:
+        quantity = quantities[cart_id]
+        amount += (quantity - current) * price
+        if quantity == 0:
+            removed_ids.append(cart_id)
+        else:
+            updates.append({'id': cart_id, 'quantity': quantity})
+        lines.append({'cart_id': cart_id, 'quantity': quantity, 'line_total': round(quantity * price, 2)})
+
+    if updates:
+        db.session.execute(update(Cart), updates)
+    if removed_ids:
+        db.session.execute(
+            delete(Cart).where(Cart.id.in_(removed_ids), Cart.user_id == user_id)
+        )
+    return lines, len(removed_ids), amount
+
+
+def parse_changes(operations):
+    """Validate a batch of ``{'cart_id', 'quantity'}`` changes into ``{cart_id: quantity}``"""
+    if not isinstance(operations, list) or not operations:
+        raise CartError('No cart changes given')
+
+    quantities = {}
+    for operation in operations:
+        try:
+            cart_id = int(operation['cart_id'])
+            quantity = int(operation['quantity'])
+        except (KeyError, TypeError, ValueError):
+            raise CartError('Each change needs an integer cart_id and quantity')
+        if quantity < 0:
+            raise CartError('Quantity cannot be negative')
+        quantities[cart_id] = quantity
+    return quantities
+
+
+def merge_items(user_id, quantities):
+    """Merge ``{book_id: quantity}`` (a guest cart) into the user's cart in one statement.
+
+    ``INSERT ... SELECT FROM book WHERE id IN (...) ON CONFLICT (user_id,
+    book_id) DO UPDATE`` adds every line at once: books that are gone or out
+    of stock are skipped, and both new and existing lines are capped at the
+    current stock. Returns the number of lines written. Does not commit.
+    """
+    if not quantities:
+        return 0
+
+    requested = case({book_id: quantity for book_id, quantity in quantities.items()}, value=Book.id)
+    source = select(
+        literal(user_id), Book.id,
+        case((requested > Book.stock, Book.stock), else_=requested),
+        literal(datetime.utcnow())
+    ).where(Book.id.in_(list(quantities)), Book.stock > 0)
+
+    statement = _insert().from_select(['user_id', 'book_id', 'quantity', 'created_at'], source)
+    # Spelled as a column: SQLAlchemy would otherwise add ``excluded`` to the subquery's FROM
+    book_stock = select(Book.stock).where(
+        Book.id == literal_column('excluded.book_id', Integer)
+    ).scalar_subquery()
+    merged = Cart.quantity + statement.excluded.quantity
+    statement = statement.on_conflict_do_update(
+        index_elements=['user_id', 'book_id'],
+        set_={'quantity': case((merged > book_stock, book_stock), else_=merged)},
+    )
+    return db.session.execute(statement).rowcount
+
+
+def remove_purchased(user_id, quantities):
+    """Take ``{book_id: quantity}`` that were just paid for out of the user's cart.
+
+    Lines are reduced rather than deleted, so copies added after the checkout
+    started stay in the cart; lines that reach zero are removed. Two
+    statements whatever the number of lines. Does not commit.
+    """
+    if not quantities:
+        return
+    paid = case({book_id: quantity for book_id, quantity in quantities.items()}, value=Cart.book_id)
+    lines = (Cart.user_id == user_id, Cart.book_id.in_(list(quantities)))
+    db.session.execute(
+        update(Cart).where(*lines).values(quantity=Cart.quantity - paid)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.execute(
+        delete(Cart).where(*lines, Cart.quantity <= 0).execution_options(synchronize_session=False)
+    )
@@ -0,0 +1,79 @@
+from flask import session
+from sqlalchemy import func
+from app import db
+from app.models import Book, Cart
+from app.utils.guest_cart import guest_cart_summary
+from app.utils import checkout_state
+
+
+SESSION_KEY = 'cart_summary'
+
+
+def _store(count, total):
+    summary = {'count': max(count, 0), 'total': round(max(total, 0), 2)}
+    session[SESSION_KEY] = summary
+    return summary
+
+
+def refresh_cart_summary(user_id=None):
+    """Recompute the summary with one aggregate query and store it in the session"""
+    checkout_state.forget()
+    user_id = user_id or session.get('user_id')
+    count, total = db.session.query(
+        func.count(Cart.id), func.coalesce(func.sum(Cart.quantity * Book.price), 0)
+    ).join(Book, Book.id == Cart.book_id).filter(Cart.user_id == user_id).one()
+    return _store(count, float(total))
+
+
+def paid_cart_summary(quantities, user_id=None):
+    """Store the summary of the cart without ``{book_id: quantity}`` that was just
+    paid for, before the order (built by the webhook worker) takes it out"""
+    checkout_state.forget()
+    user_id = user_id or session.get('user_id')
+    count, total = 0, 0.0
+    for book_id, quantity, price in db.session.query(Cart.book_id, Cart.quantity, Book.price).join(
+        Book, Book.id == Cart.book_id
+    ).filter(Cart.user_id == user_id):
+        remaining = quantity - quantities.get(book_id, 0)
+        if remaining > 0:
+            count += 1
+            total += remaining * price
+    return _store(count, total)
+
+
+def set_cart_summary(cart_items):
+    """Store the summary of already loaded ``[(Cart, Book)]`` rows (no query)"""
+    return _store(len(cart_items), sum(item.quantity * book.price for item, book in cart_items))
+
+
+def adjust_cart_summary(lines=0, amount=0.0):
+    """Apply a cart write to the stored summary: ``lines`` rows added (or removed),
+    ``amount`` added to the total. Every cart write goes through here or
+    ``clear_cart_summary``, which also drop the reusable checkout session."""
+    checkout_state.forget()  # The cart changed: its checkout session no longer matches
+    summary = session.get(SESSION_KEY)
+    if summary is None:
+        # Nothing to adjust yet: read the (already committed) cart instead
+        return refresh_cart_summary()
+    return _store(summary['count'] + lines, summary['total'] + amount)
+
+
+def clear_cart_summary():
+    checkout_state.forget()
+    return _store(0, 0)
+
+
+def get_cart_summary():
+    """Navbar cart summary ``{'count', 'total'}`` for the current visitor.
+
+    Kept in the session and updated by every cart write, so pages render the
+    badge without a query or a follow-up request. Only sessions created before
+    the summary existed pay one query, once. Guests get the summary of their
+    cookie cart, priced from the catalog cache.
+    """
+    if 'user_id' not in session:
+        return guest_cart_summary()
+    summary = session.get(SESSION_KEY)
+    if summary is None:
+        summary = refresh_cart_summary()
+    return summary
@@ -0,0 +1,274 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from sqlalchemy import event, func, select, update, insert
+from sqlalchemy.orm import Session
+from app import db
+from app.models import Book, CatalogVersion
+
+
+class CachedBook:
+    """Read-only snapshot of a Book row, safe to share between requests.
+
+    Stock is not part of it: it changes with every sale, so it is read fresh
+    with ``catalog_cache.stock_levels()``.
+    """
+
+    __slots__ = ('id', 'title', 'author', 'price', 'description', 'image_url',
+                 'image_key', 'genre', 'created_at', 'updated_at')
+
+    def __init__(self, book):
+        for name in self.__slots__:
+            setattr(self, name, getattr(book, name))
+
+    def __repr__(self):
+        return f'<CachedBook {self.title}>'
+
+
+class CatalogCache:
+    """In-process catalog cache shared by all requests of a worker.
+
+    Holds a bounded LRU of book snapshots plus precomputed "recent books"
+    lists; derived indexes (suggestions, facet counts) subscribe to its
+    invalidations. Book writes made through the ORM are picked up by
+    SQLAlchemy events: the writing worker evicts the affected entries after
+    commit, and the ``catalog_version`` generation is bumped in the same
+    transaction so every other worker drops its cache the next time it checks
+    (at most every ``CATALOG_CACHE_CHECK_SECONDS``).
+
+    Stock changes (sales, restocks) never touch the generation, so they
+    neither serialise on its row nor empty other workers' caches. Stock
+    subscribers (the facet counts) hear about this worker's changes after
+    commit, and about other workers' through the stock stamp,
+    ``max(book.updated_at)``, read together with the generation.
+    """
+
+    def __init__(self):
+        self.books = OrderedDict()
+        self.lists = {}
+        self.max_books = 1024
+        self.check_seconds = 5
+        self.generation = None
+        self.updated_at = None
+        self.checked_at = 0
+        self.stock_stamp = None
+        self.stock_overlap = 60
+        # Bumped on every local invalidation so loads racing a write are not stored
+        self.epoch = 0
+        self.lock = threading.Lock()
+        self.subscribers = []
+        self.stock_subscribers = []
+        self._listening = False
+
+    def init_app(self, app):
+        self.max_books = app.config.get('CATALOG_CACHE_SIZE', self.max_books)
+        self.check_seconds = app.config.get('CATALOG_CACHE_CHECK_SECONDS', self.check_seconds)
+        self.stock_overlap = app.config.get('CATALOG_STOCK_OVERLAP_SECONDS', self.stock_overlap)
+
+        if not self._listening:
+            for name in ('after_insert', 'after_update', 'after_delete'):
+                event.listen(Book, name, self._on_book_write)
+            event.listen(Session, 'after_flush', self._after_flush)
+            event.listen(Session, 'after_commit', self._after_commit)
+            event.listen(Session, 'after_rollback', self._after_rollback)
+            self._listening = True
+
+    # Reads
+
+    def get_book(self, book_id):
+        """Snapshot of a book by id, or None if it doesn't exist"""
+        self._sync()
+        with self.lock:
+            if book_id in self.books:
+                self.books.move_to_end(book_id)
+                return self.books[book_id]
+            epoch = self.epoch
+
+        book = db.session.get(Book, book_id)
+        if book is None:
+            return None
+
+        snapshot = CachedBook(book)
+        with self.lock:
+            if epoch == self.epoch:
+                self.books[book_id] = snapshot
+                while len(self.books) > self.max_books:
+                    self.books.popitem(last=False)
+        return snapshot
+
+    def stock_levels(self, book_ids):
+        """``{book_id: stock}`` from the database (one primary key lookup)"""
+        book_ids = list(book_ids)
+        if not book_ids:
+            return {}
+        return dict(db.session.query(Book.id, Book.stock).filter(Book.id.in_(book_ids)).all())
+
+    def recent_books(self, limit=6):
+        """Newest books, as shown on the home page"""
+        return self._get_list(('recent', limit), lambda: [
+            CachedBook(book)
+            for book in Book.query.order_by(Book.created_at.desc()).limit(limit).all()
+        ])
+
+    def _get_list(self, key, load):
+        self._sync()
+        with self.lock:
+            if key in self.lists:
+                return self.lists[key]
+            epoch = self.epoch
+
+        value = load()
+        with self.lock:
+            if epoch == self.epoch:
+                self.lists[key] = value
+        return value
+
+    # Invalidation
+
+    def subscribe(self, callback):
+        """Call ``callback(book_ids)`` whenever cached data is invalidated.
+
+        ``book_ids`` is the set of changed books, or None when everything must
+        be considered stale (e.g. another worker wrote to the catalog).
+        """
+        self.subscribers.append(callback)
+
+    def subscribe_stock(self, callback):
+        """Also call ``callback(book_ids)`` when only stock changed (None: any book may have)"""
+        self.stock_subscribers.append(callback)
+
+    def clear(self):
+        with self.lock:
+            self.books.clear()
+            self.lists.clear()
+            self.epoch += 1
+        for callback in self.subscribers:
+            callback(None)
+
+    def evict(self, book_ids):
+        """Drop the given books and every precomputed list"""
+        with self.lock:
+            for book_id in book_ids:
+                self.books.pop(book_id, None)
+            self.lists.clear()
+            self.epoch += 1
+        for callback in self.subscribers:
+            callback(set(book_ids))
+
+    def mark_dirty(self, session, book_ids=None):
+        """Record book writes made in ``session`` by bulk SQL that skips ORM events.
+
+        Pass None when the affected ids aren't known (e.g. bulk inserts); the
+        whole cache is then dropped after commit.
+        """
+        if book_ids is None:
+            session.info['catalog_dirty_all'] = True
+        session.info.setdefault('catalog_dirty', set()).update(book_ids or ())
+        self._bump_generation(session)
+
+    def mark_stock_changed(self, session, book_ids):
+        """Record stock-only writes (bulk SQL that also sets ``updated_at``) made in
+        ``session``: stock subscribers are told after commit; no generation bump"""
+        session.info.setdefault('catalog_stock_dirty', set()).update(book_ids)
+
+    def _sync(self):
+        """Drop everything if another worker bumped the generation since we last looked,
+        and pass on stock changes made by other workers"""
+        now = time.time()
+        if now - self.checked_at < self.check_seconds:
+            return
+
+        generation, updated_at, stock_stamp = db.session.execute(select(
+            select(CatalogVersion.generation).where(CatalogVersion.id == 1).scalar_subquery(),
+            select(CatalogVersion.updated_at).where(CatalogVersion.id == 1).scalar_subquery(),
+            select(func.max(Book.updated_at)).scalar_subquery(),
+        )).one()
+        self.checked_at = now
+
+        if generation != self.generation:
+            self.clear()
+            self.generation = generation
+            self.updated_at = updated_at
+        elif stock_stamp != self.stock_stamp:
+            if self.stock_stamp is None:
+                changed = None
+            else:
+                # The overlap catches writes stamped earlier but committed after the last look
+                since = self.stock_stamp - timedelta(seconds=self.stock_overlap)
+                changed = {book_id for book_id, in db.session.query(Book.id).filter(Book.updated_at > since)}
+            self._notify_stock(changed)
+        self.stock_stamp = stock_stamp
+
+    def version(self):
+        """(generation, last change time) of the whole catalog, checked against the
+        database at most every ``check_seconds``"""
+        self._sync()
+        return self.generation, self.updated_at
+
+    def stock_version(self):
+        """Latest ``book.updated_at``, which stock writes also set; for pages that show stock"""
+        self._sync()
+        return self.stock_stamp
+
+    def _notify_stock(self, book_ids):
+        for callback in self.stock_subscribers:
+            callback(book_ids)
+
+    def _on_book_write(self, mapper, connection, target):
+        session = Session.object_session(target)
+        if session is not None:
+            session.info.setdefault('catalog_dirty', set()).add(target.id)
+
+    def _after_flush(self, session, flush_context):
+        if session.info.get('catalog_dirty'):
+            self._bump_generation(session)
+
+    def _bump_generation(self, session):
+        """Bump the shared generation once per transaction, atomically with the book writes"""
+        if session.info.get('catalog_generation') is not None:
+            return
+
+        now = datetime.utcnow()
+        result = session.execute(
+            update(CatalogVersion).where(CatalogVersion.id == 1).values(
+                generation=CatalogVersion.generation + 1, updated_at=now
+            )
+        )
+        if result.rowcount == 0:
+            session.execute(insert(CatalogVersion).values(id=1, generation=1, updated_at=now))
+
+        session.info['catalog_updated_at'] = now
+
+        session.info['catalog_generation'] = session.execute(
+            select(CatalogVersion.generation).where(CatalogVersion.id == 1)
+        ).scalar()
+
+    def _after_commit(self, session):
+        stock_dirty = session.info.pop('catalog_stock_dirty', None)
+        if stock_dirty:
+            self._notify_stock(stock_dirty)
+
+        dirty = session.info.pop('catalog_dirty', None)
+        dirty_all = session.info.pop('catalog_dirty_all', False)
+        generation = session.info.pop('catalog_generation', None)
+        updated_at = session.info.pop('catalog_updated_at', None)
+        if not dirty and not dirty_all:
+            return
+
+        if (not dirty_all and generation is not None and self.generation is not None
+                and generation == self.generation + 1):
+            # Only our own write happened since the last check
+            self.evict(dirty)
+        else:
+            self.clear()
+        self.generation = generation
+        self.updated_at = updated_at
+
+    def _after_rollback(self, session):
+        for key in ('catalog_dirty', 'catalog_dirty_all', 'catalog_stock_dirty',
+                    'catalog_generation', 'catalog_updated_at'):
+            session.info.pop(key, None)
+
+
+catalog_cache = CatalogCache()
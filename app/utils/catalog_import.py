@@ -0,0 +1,172 @@
+import csv
+import io
+import json
+import math
+from datetime import datetime
+from sqlalchemy import insert, update
+from app import db
+from app.models import Book, GenreEnum
+from app.utils.catalog_cache import catalog_cache
+from app.utils.dashboard_stats import dashboard_stats
+
+
+CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 50
+
+
+class ImportResult:
+    """Counts and (the first few) row errors from a catalog import"""
+
+    def __init__(self):
+        self.inserted = 0
+        self.updated = 0
+        self.skipped = 0
+        self.errors = []
+
+    def add_error(self, line, message):
+        self.skipped += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(f'Line {line}: {message}')
+
+    def summary(self):
+        return f'{self.inserted} added, {self.updated} updated, {self.skipped} skipped'
+
+
+def parse_genre(value):
+    """GenreEnum from a value ("Non-Fiction") or name ("NONFICTION"), case-insensitive"""
+    text = (value or '').strip()
+    if not text:
+        return GenreEnum.OTHER
+    for genre in GenreEnum:
+        if text.lower() in (genre.value.lower(), genre.name.lower()):
+            return genre
+    raise ValueError(f"unknown genre '{text}'")
+
+
+def parse_row(record):
+    """Validate one input record and return the column values for Book"""
+    title = (record.get('title') or '').strip()
+    author = (record.get('author') or '').strip()
+    if not title or not author:
+        raise ValueError('title and author are required')
+
+    price = float(record.get('price'))
+    if not (math.isfinite(price) and price >= 0):  # NaN and inf would break checkout amounts
+        raise ValueError('price must be a non-negative number')
+
+    stock = int(record.get('stock') or 0)
+    if stock < 0:
+        raise ValueError('stock cannot be negative')
+
+    return {
+        'title': title[:200],
+        'author': author[:100],
+        'price': price,
+        'description': record.get('description') or None,
+        'image_url': record.get('image_url') or None,
+        'stock': stock,
+        'genre': parse_genre(record.get('genre')),
+    }
+
+
+def iter_records(stream, fmt):
+    """Yield (line number, dict) from a CSV or JSONL text stream without reading it all"""
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for record in reader:
+            yield reader.line_num, record
+    elif fmt == 'jsonl':
+        for line_number, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                record = None
+            yield line_number, record if isinstance(record, dict) else None
+    else:
+        raise ValueError(f'Unsupported import format: {fmt}')
+
+
+def format_for(filename):
+    """'csv' or 'jsonl' from a file name"""
+    name = (filename or '').lower()
+    if name.endswith('.csv'):
+        return 'csv'
+    if name.endswith('.jsonl') or name.endswith('.ndjson'):
+        return 'jsonl'
+    raise ValueError('Please upload a .csv or .jsonl file')
+
+
+def import_catalog(stream, fmt, chunk_size=CHUNK_SIZE):
+    """Upsert books from a CSV/JSONL text stream in chunks.
+
+    Rows are matched to existing books on (title, author). Each chunk costs
+    one lookup query, one executemany UPDATE and one executemany INSERT, and
+    is committed on its own, so memory use is bounded by ``chunk_size``
+    regardless of file size.
+    """
+    result = ImportResult()
+    chunk = {}
+
+    for line_number, record in iter_records(stream, fmt):
+        if record is None:
+            result.add_error(line_number, 'not a JSON object')
+            continue
+        try:
+            row = parse_row(record)
+        except (TypeError, ValueError) as e:
+            result.add_error(line_number, str(e))
+            continue
+
+        # Later rows for the same book win
+        chunk[(row['title'], row['author'])] = row
+        if len(chunk) >= chunk_size:
+            _upsert_chunk(chunk, result)
+            chunk = {}
+
+    if chunk:
+        _upsert_chunk(chunk, result)
+
+    return result
+
+
+def _upsert_chunk(chunk, result):
+    try:
+        # Seek on the title index, then match authors here
+        titles = {title for title, author in chunk}
+        existing = dict(
+            ((title, author), book_id)
+            for book_id, title, author in db.session.query(Book.id, Book.title, Book.author).filter(
+                Book.title.in_(titles)
+            )
+        )
+
+        now = datetime.utcnow()
+        updates = []
+        inserts = []
+        for key, row in chunk.items():
+            if key in existing:
+                updates.append(dict(row, id=existing[key], updated_at=now))
+            else:
+                inserts.append(dict(row, created_at=now, updated_at=now))
+
+        if updates:
+            db.session.execute(update(Book), updates)
+        if inserts:
+            db.session.execute(insert(Book), inserts)
+
+        catalog_cache.mark_dirty(db.session)
+        dashboard_stats.record(db.session, {'books': (len(inserts), 0)})
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    result.updated += len(updates)
+    result.inserted += len(inserts)
+
+
+def open_text(binary_stream):
+    """Text view of an uploaded/opened binary file (handles a UTF-8 BOM)"""
+    return io.TextIOWrapper(binary_stream, encoding='utf-8-sig', newline='')
@@ -2,6 +2,10 @@ from flask import session, current_app
 from app.models import User, Book, Order, OrderItem, GenreEnum
 from app import db
 from app.utils.ai_service import ai_service
+from app.utils.search_service import search_service
+from app.utils.facet_index import facet_index
+from app.utils.dashboard_stats import dashboard_stats
+from app.utils.order_queries import with_lines
 from sqlalchemy import func
 import re
 
@@ -163,12 +167,8 @@ class ChatbotService:
         book_info = self._extract_book_info(message)
         
         if book_info:
-            books = Book.query.filter(
-                db.or_(
-                    Book.title.ilike(f'%{book_info}%'),
-                    Book.author.ilike(f'%{book_info}%')
-                )
-            ).limit(10).all()
+            # Any term may match; best-ranked books first
+            books = search_service.filter_books(Book.query, book_info, match_all=False).limit(10).all()
             
             if books:
                 context = f"Books matching '{book_info}':\n"
@@ -178,12 +178,12 @@ class ChatbotService:
                 return context
         
         # General book inventory
-        total_books = Book.query.count()
+        total_books = dashboard_stats.total_books()
         return f"Total books in inventory: {total_books}"
     
     def _get_genre_context(self):
         """Get genre-related context"""
-        genres = db.session.query(Book.genre, func.count(Book.id)).group_by(Book.genre).all()
+        genres = facet_index.genre_counts()
         
         if genres:
             context = "Available genres:\n"
@@ -199,7 +199,7 @@ class ChatbotService:
         if not user:
             return f"No user found with username '{username}'"
         
-        orders = Order.query.filter_by(user_id=user.id).order_by(Order.created_at.desc()).limit(10).all()
+        orders = with_lines(Order.query.filter_by(user_id=user.id)).order_by(Order.created_at.desc()).limit(10).all()
         
         if orders:
             context = f"Orders for {username}:\n"
@@ -216,13 +216,12 @@ class ChatbotService:
     
     def _get_sales_context(self):
         """Get sales context (admin only)"""
-        total_sales = db.session.query(func.sum(Order.total_amount)).scalar() or 0
-        total_orders = Order.query.count()
+        # Read from the dashboard rollup, not aggregated per message
+        total_sales = dashboard_stats.total_sales()
+        total_orders = dashboard_stats.total_orders()
         
         # Sales by status
-        status_breakdown = db.session.query(
-            Order.status, func.count(Order.id), func.sum(Order.total_amount)
-        ).group_by(Order.status).all()
+        status_breakdown = dashboard_stats.orders_by_status()
         
         context = f"Sales Summary:\n"
         context += f"- Total Revenue: ${total_sales:.2f}\n"
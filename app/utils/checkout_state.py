@@ -0,0 +1,88 @@
+import hashlib
+import json
+import time
+from datetime import datetime, timedelta
+from flask import current_app, session
+from sqlalchemy import update
+from app import db
+from app.models import CheckoutSession
+
+
+def record_created(checkout_session, user_id, reference, expires_at):
+    """Store a newly created Stripe checkout session as ``open``. Commits."""
+    db.session.add(CheckoutSession(
+        id=checkout_session.id, user_id=user_id, reference=reference, status='open',
+        amount_total=checkout_session.get('amount_total'), expires_at=expires_at
+    ))
+    db.session.commit()
+
+
+def mark(session_id, status, **values):
+    """Move a session to ``status`` (paid, expired) with any extra columns, e.g.
+    ``payment_intent`` or ``order_id``. Sessions we never recorded are ignored.
+    Does not commit."""
+    db.session.execute(
+        update(CheckoutSession)
+        .where(CheckoutSession.id == session_id)
+        .values(status=status, updated_at=datetime.utcnow(), **values)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def wait_until_settled(session_id, user_id):
+    """The user's session once it is no longer ``open``, polling the local table
+    for up to CHECKOUT_STATE_WAIT_SECONDS (the webhook usually lands while the
+    customer is being redirected). Returns the row, still ``open`` if the
+    webhook is late, or None for a session we have no record of."""
+    deadline = time.monotonic() + current_app.config.get('CHECKOUT_STATE_WAIT_SECONDS', 2)
+    interval = current_app.config.get('CHECKOUT_STATE_POLL_INTERVAL', 0.2)
+    while True:
+        state = db.session.query(CheckoutSession).filter_by(id=session_id, user_id=user_id).first()
+        if state is None or state.status != 'open' or time.monotonic() >= deadline:
+            return state
+        db.session.rollback()  # End the transaction so the next read sees the webhook's commit
+        time.sleep(interval)
+
+
+# Session key of the user's reusable checkout session: {'cart_hash', 'id', 'expires_at'}
+REUSE_KEY = 'checkout_session'
+
+
+def cart_hash(cart_items):
+    """Fingerprint of ``[(Cart, Book)]`` contents and prices"""
+    lines = sorted((book.id, item.quantity, round(book.price, 2)) for item, book in cart_items)
+    return hashlib.sha256(json.dumps(lines).encode()).hexdigest()
+
+
+def remember(checkout_session_id, cart_hash, expires_at):
+    """Offer this session again while the cart keeps the same hash"""
+    session[REUSE_KEY] = {'cart_hash': cart_hash, 'id': checkout_session_id,
+                          'expires_at': expires_at.isoformat()}
+
+
+def forget():
+    """Drop the reusable session; called on every cart write"""
+    session.pop(REUSE_KEY, None)
+
+
+def reusable_session(user_id, cart_hash):
+    """Id of a still-open checkout session created for exactly this cart, or None.
+
+    Sessions that end within CHECKOUT_SESSION_REUSE_MARGIN_MINUTES are not
+    reused, so the customer has time to pay before the stock hold lapses.
+    """
+    cached = session.get(REUSE_KEY)
+    if not cached or cached['cart_hash'] != cart_hash:
+        return None
+
+    margin = timedelta(minutes=current_app.config.get('CHECKOUT_SESSION_REUSE_MARGIN_MINUTES', 5))
+    if datetime.fromisoformat(cached['expires_at']) <= datetime.utcnow() + margin:
+        forget()
+        return None
+
+    # Paid or expired in the meantime (primary key lookup)
+    status = db.session.query(CheckoutSession.status).filter_by(id=cached['id'], user_id=user_id).scalar()
+    if status != 'open':
+        forget()
+        return None
+    return cached['id']
@@ -0,0 +1,144 @@
+import hashlib
+import io
+import os
+import tempfile
+import requests
+from flask import url_for
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+
+# Widths generated for every cover: admin/cart thumbnails, listing cards, detail page
+VARIANTS = {
+    'thumb': 160,
+    'list': 320,
+    'detail': 640,
+}
+
+FORMATS = {
+    'webp': {'format': 'WEBP', 'quality': 80, 'method': 4},
+    'jpg': {'format': 'JPEG', 'quality': 82, 'optimize': True, 'progressive': True},
+}
+
+# Part of the content hash, so changing the variants/encoder settings yields new names
+PIPELINE_VERSION = b'covers-v1'
+
+
+class CoverImageError(ValueError):
+    """The cover could not be downloaded or is not a usable image"""
+
+
+class CoverStore:
+    """Resized cover variants stored on local disk under content-hashed names.
+
+    A cover is ingested once (downloaded or uploaded) and written as WebP and
+    JPEG at each width in ``VARIANTS``, named ``<key>-<width>.<ext>`` where
+    ``key`` is a hash of the source bytes. Files never change once written, so
+    they are served with a long-lived ``immutable`` Cache-Control and
+    re-ingesting the same image is a no-op.
+    """
+
+    def __init__(self):
+        self.directory = None
+        self.max_bytes = 5 * 1024 * 1024
+        self.download_timeout = 10
+        self.max_age = 365 * 24 * 3600
+
+    def init_app(self, app):
+        self.directory = app.config['COVER_IMAGE_DIR']
+        self.max_bytes = app.config.get('COVER_IMAGE_MAX_BYTES', self.max_bytes)
+        self.download_timeout = app.config.get('COVER_IMAGE_DOWNLOAD_TIMEOUT', self.download_timeout)
+        self.max_age = app.config.get('COVER_IMAGE_MAX_AGE', self.max_age)
+        os.makedirs(self.directory, exist_ok=True)
+
+        app.add_template_global(cover_url)
+        app.add_template_global(cover_srcset)
+
+    def fetch(self, url):
+        """Download a remote image, refusing anything over ``max_bytes``"""
+        try:
+            with requests.get(url, stream=True, timeout=self.download_timeout) as response:
+                response.raise_for_status()
+                data = bytearray()
+                for chunk in response.iter_content(64 * 1024):
+                    data.extend(chunk)
+                    if len(data) > self.max_bytes:
+                        raise CoverImageError('image is too large')
+        except requests.RequestException as e:
+            raise CoverImageError(f'could not download image ({e.__class__.__name__})')
+        return bytes(data)
+
+    def read_upload(self, upload):
+        """Bytes of an uploaded FileStorage, refusing anything over ``max_bytes``"""
+        data = upload.stream.read(self.max_bytes + 1)
+        if len(data) > self.max_bytes:
+            raise CoverImageError('image is too large')
+        return data
+
+    def save(self, data):
+        """Write all variants of an image and return its key"""
+        key = hashlib.sha256(PIPELINE_VERSION + data).hexdigest()[:20]
+        paths = {
+            (width, ext): os.path.join(self.directory, variant_name(key, width, ext))
+            for width in VARIANTS.values() for ext in FORMATS
+        }
+        if all(os.path.exists(path) for path in paths.values()):
+            return key
+
+        try:
+            image = Image.open(io.BytesIO(data))
+            # Let the JPEG decoder downscale while decoding large photos
+            image.draft('RGB', (max(VARIANTS.values()) * 2, max(VARIANTS.values()) * 4))
+            image = ImageOps.exif_transpose(image)
+            image = _flatten(image)
+        except (UnidentifiedImageError, OSError, Image.DecompressionBombError) as e:
+            raise CoverImageError('not a supported image') from e
+
+        for width in VARIANTS.values():
+            variant = image.copy()
+            # Keep the aspect ratio; only ever shrink
+            variant.thumbnail((width, width * 3), Image.LANCZOS)
+            for ext, options in FORMATS.items():
+                self._write(paths[(width, ext)], variant, options)
+        return key
+
+    def _write(self, path, image, options):
+        # Write to a temp file first so readers never see a partial image
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                image.save(f, **options)
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, path)
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+
+
+def _flatten(image):
+    """RGB copy of an image, with any transparency composited onto white"""
+    if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def variant_name(key, width, ext):
+    return f'{key}-{width}.{ext}'
+
+
+def cover_url(key, variant='list', ext='jpg'):
+    """URL of one stored cover variant"""
+    return url_for('main.cover_image', filename=variant_name(key, VARIANTS[variant], ext))
+
+
+def cover_srcset(key, ext='jpg'):
+    """``srcset`` listing every width of a stored cover"""
+    return ', '.join(
+        f"{url_for('main.cover_image', filename=variant_name(key, width, ext))} {width}w"
+        for width in VARIANTS.values()
+    )
+
+
+cover_store = CoverStore()
@@ -0,0 +1,215 @@
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+from sqlalchemy import event, func, inspect, delete, insert, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from app import db
+from app.models import Book, Order, User, StatsCounter
+
+
+RECONCILE_JOB_ID = 'reconcile_dashboard_stats'
+
+# Orders that count towards revenue on the dashboard
+REVENUE_STATUSES = ('completed', 'delivered')
+
+
+class DashboardStats:
+    """Book, user and order totals kept in the ``stats_counter`` rollup table.
+
+    ORM writes are counted as they are flushed: new and deleted books, users
+    and orders, and order status/total and user role changes each add a
+    delta to their counter rows in the same transaction. Bulk SQL that skips
+    ORM events reports its deltas with ``record()``. A scheduled job
+    recomputes every counter from the base tables to correct any drift.
+    Reads come from a per-worker snapshot of the (small) table, refreshed
+    every ``STATS_CACHE_SECONDS`` and after this worker's own changes, so the
+    dashboard costs the same however many orders there are.
+    """
+
+    def __init__(self):
+        self.cache_seconds = 10
+        self.snapshot = None
+        self.loaded_at = 0
+        self.lock = threading.Lock()
+        self._listening = False
+
+    def init_app(self, app, scheduler):
+        self.cache_seconds = app.config.get('STATS_CACHE_SECONDS', self.cache_seconds)
+
+        if not self._listening:
+            # Loads the previous value on assignment, so the flush sees the transition
+            for attribute in (Order.status, Order.total_amount, User.role):
+                event.listen(attribute, 'set', self._on_set, active_history=True)
+            event.listen(Session, 'after_flush', self._after_flush)
+            event.listen(Session, 'after_commit', self._after_commit)
+            event.listen(Session, 'after_rollback', self._after_rollback)
+            self._listening = True
+
+        def reconcile_job():
+            with app.app_context():
+                self.reconcile()
+
+        scheduler.add_job(
+            id=RECONCILE_JOB_ID, func=reconcile_job, trigger='interval',
+            minutes=app.config.get('STATS_RECONCILE_MINUTES', 15), replace_existing=True
+        )
+
+    # Reads
+
+    def counters(self):
+        """``{key: (count, amount)}`` from the snapshot"""
+        with self.lock:
+            if self.snapshot is not None and time.time() - self.loaded_at < self.cache_seconds:
+                return self.snapshot
+
+        rows = db.session.query(StatsCounter.key, StatsCounter.count, StatsCounter.amount).all()
+        if not rows:
+            # First use after the migration
+            try:
+                self.reconcile()
+            except IntegrityError:
+                db.session.rollback()  # Another worker reconciled first
+            rows = db.session.query(StatsCounter.key, StatsCounter.count, StatsCounter.amount).all()
+
+        snapshot = {key: (count, amount) for key, count, amount in rows}
+        with self.lock:
+            self.snapshot = snapshot
+            self.loaded_at = time.time()
+        return snapshot
+
+    def total_books(self):
+        return self.counters().get('books', (0, 0))[0]
+
+    def total_users(self, role='user'):
+        return self.counters().get(f'users:{role}', (0, 0))[0]
+
+    def orders_by_status(self):
+        """``[(status, order count, total amount)]``"""
+        return sorted(
+            (key.split(':', 1)[1], count, amount)
+            for key, (count, amount) in self.counters().items()
+            if key.startswith('orders:') and count
+        )
+
+    def total_orders(self):
+        return sum(count for status, count, amount in self.orders_by_status())
+
+    def total_sales(self, statuses=None):
+        return sum(amount for status, count, amount in self.orders_by_status()
+                   if statuses is None or status in statuses)
+
+    # Writes
+
+    def record(self, session, deltas):
+        """Add ``{key: (count delta, amount delta)}`` to the counters in ``session``'s
+        transaction; for bulk SQL that skips ORM events"""
+        deltas = {key: delta for key, delta in deltas.items() if delta[0] or delta[1]}
+        if not deltas:
+            return
+
+        now = datetime.utcnow()
+        insert_for = postgresql.insert if session.get_bind().dialect.name == 'postgresql' else sqlite.insert
+        for key, (count, amount) in sorted(deltas.items()):  # Sorted: consistent lock order
+            statement = insert_for(StatsCounter).values(key=key, count=count, amount=amount, updated_at=now)
+            session.execute(statement.on_conflict_do_update(
+                index_elements=['key'],
+                set_={'count': StatsCounter.count + statement.excluded.count,
+                      'amount': StatsCounter.amount + statement.excluded.amount,
+                      'updated_at': now},
+            ))
+        session.info['stats_changed'] = True
+
+    def reconcile(self):
+        """Recompute every counter from the base tables. Commits.
+
+        The counters are locked before the base tables are read: a write that
+        commits before the lock is in the totals, and one that commits after
+        it waits for the lock to add its delta to them, so no change is lost.
+        Concurrent reconciles (the job in every worker) queue on the same lock.
+        """
+        now = datetime.utcnow()
+        try:
+            if db.engine.dialect.name == 'postgresql':
+                # Blocks counter upserts and other reconciles; reads go on
+                db.session.execute(text('LOCK TABLE stats_counter IN SHARE ROW EXCLUSIVE MODE'))
+            # On SQLite the first write takes the database write lock
+            db.session.execute(delete(StatsCounter))
+
+            rows = [{'key': 'books', 'count': db.session.query(func.count(Book.id)).scalar(), 'amount': 0}]
+            rows += [
+                {'key': f'users:{role}', 'count': count, 'amount': 0}
+                for role, count in db.session.query(User.role, func.count(User.id)).group_by(User.role)
+            ]
+            rows += [
+                {'key': f'orders:{status}', 'count': count, 'amount': amount or 0}
+                for status, count, amount in db.session.query(
+                    Order.status, func.count(Order.id), func.sum(Order.total_amount)
+                ).group_by(Order.status)
+            ]
+            db.session.execute(insert(StatsCounter), [dict(row, updated_at=now) for row in rows])
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        self.invalidate()
+
+    def invalidate(self):
+        with self.lock:
+            self.snapshot = None
+
+    # Change tracking
+
+    def _on_set(self, target, value, oldvalue, initiator):
+        pass  # Registered only for active_history
+
+    def _after_flush(self, session, flush_context):
+        deltas = defaultdict(lambda: [0, 0.0])
+
+        for obj in session.new:
+            self._count(obj, 1, deltas)
+        for obj in session.deleted:
+            self._count(obj, -1, deltas)
+        for obj in session.dirty:
+            if isinstance(obj, Order):
+                state = inspect(obj)
+                status = state.attrs.status.history
+                total = state.attrs.total_amount.history
+                if status.has_changes() or total.has_changes():
+                    old_status = status.deleted[0] if status.deleted else obj.status
+                    old_total = total.deleted[0] if total.deleted else obj.total_amount
+                    self._add(deltas, f'orders:{old_status}', -1, -(old_total or 0))
+                    self._add(deltas, f'orders:{obj.status}', 1, obj.total_amount or 0)
+            elif isinstance(obj, User):
+                role = inspect(obj).attrs.role.history
+                if role.has_changes() and role.deleted:
+                    self._add(deltas, f'users:{role.deleted[0]}', -1)
+                    self._add(deltas, f'users:{obj.role}', 1)
+
+        if deltas:
+            self.record(session, {key: tuple(delta) for key, delta in deltas.items()})
+
+    def _count(self, obj, sign, deltas):
+        if isinstance(obj, Order):
+            self._add(deltas, f'orders:{obj.status or "pending"}', sign, sign * (obj.total_amount or 0))
+        elif isinstance(obj, Book):
+            self._add(deltas, 'books', sign)
+        elif isinstance(obj, User):
+            self._add(deltas, f'users:{obj.role or "user"}', sign)
+
+    @staticmethod
+    def _add(deltas, key, count, amount=0.0):
+        deltas[key][0] += count
+        deltas[key][1] += amount
+
+    def _after_commit(self, session):
+        if session.info.pop('stats_changed', False):
+            self.invalidate()
+
+    def _after_rollback(self, session):
+        session.info.pop('stats_changed', None)
+
+
+dashboard_stats = DashboardStats()
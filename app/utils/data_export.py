@@ -0,0 +1,92 @@
+import csv
+import io
+import json
+from datetime import datetime
+from enum import Enum
+from sqlalchemy import select
+from app import db
+from app.models import Book, Order, OrderItem, Payment, User
+
+
+BATCH_SIZE = 1000
+
+FORMATS = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+}
+
+
+def _books():
+    return select(
+        Book.id, Book.title, Book.author, Book.price, Book.stock, Book.genre,
+        Book.description, Book.image_url, Book.created_at, Book.updated_at
+    ).order_by(Book.id)
+
+
+def _orders():
+    # One row per order line, with the order header repeated
+    return select(
+        Order.id.label('order_id'), Order.user_id, User.username, Order.status,
+        Order.total_amount, Order.created_at, OrderItem.id.label('order_item_id'),
+        OrderItem.book_id, Book.title.label('book_title'), OrderItem.quantity,
+        OrderItem.price
+    ).join(User, User.id == Order.user_id).join(
+        OrderItem, OrderItem.order_id == Order.id
+    ).join(Book, Book.id == OrderItem.book_id).order_by(Order.id, OrderItem.id)
+
+
+def _payments():
+    return select(
+        Payment.id, Payment.order_id, Payment.payment_method, Payment.transaction_id,
+        Payment.amount, Payment.status, Payment.created_at
+    ).order_by(Payment.id)
+
+
+DATASETS = {
+    'books': _books,
+    'orders': _orders,
+    'payments': _payments,
+}
+
+
+def _value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    return value
+
+
+def export_rows(dataset, fmt):
+    """Yield a CSV/JSONL export of ``dataset`` as text chunks.
+
+    Rows come from a server-side cursor (``yield_per``) in batches of
+    ``BATCH_SIZE`` plain tuples, so memory stays flat however large the table
+    is. Must be consumed inside an app context (use stream_with_context for
+    HTTP responses).
+    """
+    statement = DATASETS[dataset]().execution_options(yield_per=BATCH_SIZE)
+    result = db.session.execute(statement)
+    fieldnames = list(result.keys())
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer) if fmt == 'csv' else None
+    if writer:
+        writer.writerow(fieldnames)
+
+    for batch in result.partitions():
+        for row in batch:
+            values = [_value(value) for value in row]
+            if writer:
+                writer.writerow(values)
+            else:
+                buffer.write(json.dumps(dict(zip(fieldnames, values))))
+                buffer.write('\n')
+
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+    # Header-only CSV for empty tables
+    if buffer.tell():
+        yield buffer.getvalue()
@@ -0,0 +1,144 @@
+import threading
+from collections import Counter
+from app import db
+from app.models import Book, GenreEnum
+from app.utils.catalog_cache import catalog_cache
+
+
+# (key, label, min price inclusive, max price exclusive)
+PRICE_BANDS = [
+    ('under-10', 'Under $10', None, 10),
+    ('10-25', '$10 - $25', 10, 25),
+    ('25-50', '$25 - $50', 25, 50),
+    ('50-plus', '$50 and up', 50, None),
+]
+
+
+def price_band(price):
+    """Key of the band a price falls into"""
+    for key, label, low, high in PRICE_BANDS:
+        if (low is None or price >= low) and (high is None or price < high):
+            return key
+    return PRICE_BANDS[-1][0]
+
+
+class FacetIndex:
+    """Precomputed facet counts for the books listing.
+
+    Each book falls into one (genre, price band, in stock) cell, so the
+    catalog is summarised by a Counter of at most 8 x 4 x 2 cells and any facet
+    count under any combination of the other filters is a sum over that cube.
+    Like SuggestIndex it follows catalog_cache invalidations: books written by
+    this worker are moved between cells on the next read, and a catalog write
+    from another worker triggers a rebuild. Stock changes, from any worker,
+    only move the books concerned.
+    """
+
+    def __init__(self):
+        self.cells = Counter()
+        self.cell_by_book = {}
+        self.pending = set()
+        self.stale = True
+        self.lock = threading.Lock()
+        catalog_cache.subscribe(self.invalidate)
+        catalog_cache.subscribe_stock(self.invalidate)
+
+    def invalidate(self, book_ids=None):
+        with self.lock:
+            if book_ids is None:
+                self.stale = True
+            else:
+                self.pending.update(book_ids)
+
+    def counts(self, genre=None, price=None, in_stock=False):
+        """Facet counts for the current filters.
+
+        Returns ``{'genre': {GenreEnum: n}, 'price': {band: n}, 'in_stock': n,
+        'total': n}``; each facet is counted with the *other* filters applied,
+        so the numbers say what choosing that option would return.
+        """
+        catalog_cache.version()
+        self._refresh()
+
+        with self.lock:
+            cells = list(self.cells.items())
+
+        genre_counts = Counter()
+        price_counts = Counter()
+        in_stock_count = 0
+        total = 0
+        for (cell_genre, cell_price, cell_in_stock), count in cells:
+            genre_ok = genre is None or cell_genre == genre
+            price_ok = price is None or cell_price == price
+            stock_ok = not in_stock or cell_in_stock
+
+            if price_ok and stock_ok:
+                genre_counts[cell_genre] += count
+            if genre_ok and stock_ok:
+                price_counts[cell_price] += count
+            if genre_ok and price_ok and cell_in_stock:
+                in_stock_count += count
+            if genre_ok and price_ok and stock_ok:
+                total += count
+
+        return {
+            'genre': {g: genre_counts[g] for g in GenreEnum},
+            'price': {key: price_counts[key] for key, label, low, high in PRICE_BANDS},
+            'in_stock': in_stock_count,
+            'total': total,
+        }
+
+    def genre_counts(self):
+        """[(GenreEnum, number of books)] for genres that have books"""
+        counts = self.counts()['genre']
+        return [(genre, count) for genre, count in counts.items() if count]
+
+    def _refresh(self):
+        with self.lock:
+            stale = self.stale
+            pending = self.pending
+            self.stale = False
+            self.pending = set()
+
+        columns = (Book.id, Book.genre, Book.price, Book.stock)
+        if stale:
+            rows = db.session.query(*columns).all()
+            with self.lock:
+                self.cells = Counter()
+                self.cell_by_book = {}
+                self._add(rows)
+        elif pending:
+            rows = db.session.query(*columns).filter(Book.id.in_(pending)).all()
+            with self.lock:
+                for book_id in pending:
+                    cell = self.cell_by_book.pop(book_id, None)
+                    if cell is not None:
+                        self.cells[cell] -= 1
+                        if not self.cells[cell]:
+                            del self.cells[cell]
+                self._add(rows)
+
+    def _add(self, rows):
+        for book_id, genre, price, stock in rows:
+            cell = (genre, price_band(price or 0), (stock or 0) > 0)
+            self.cell_by_book[book_id] = cell
+            self.cells[cell] += 1
+
+
+facet_index = FacetIndex()
+
+
+def apply_facets(query, genre=None, price=None, in_stock=False):
+    """Filter a Book query by exact genre, price band and availability"""
+    if genre is not None:
+        query = query.filter(Book.genre == genre)
+    if price is not None:
+        for key, label, low, high in PRICE_BANDS:
+            if key == price:
+                if low is not None:
+                    query = query.filter(Book.price >= low)
+                if high is not None:
+                    query = query.filter(Book.price < high)
+    if in_stock:
+        query = query.filter(Book.stock > 0)
+    return query
@@ -0,0 +1,155 @@
+from flask import current_app, g, request, after_this_request
+from itsdangerous import URLSafeSerializer, BadSignature
+from app.utils.catalog_cache import catalog_cache
+from app.utils.cart_service import CartError, parse_changes, merge_items
+
+
+COOKIE_NAME = 'guest_cart'
+
+
+class GuestCartLine:
+    """Stands in for a Cart row on the cart page; a guest line's id is its book id"""
+
+    __slots__ = ('id', 'book_id', 'quantity')
+
+    def __init__(self, book_id, quantity):
+        self.id = self.book_id = book_id
+        self.quantity = quantity
+
+
+def _serializer():
+    return URLSafeSerializer(current_app.config['SECRET_KEY'], salt='guest-cart')
+
+
+def load_guest_cart():
+    """``{book_id: quantity}`` from the signed cookie; empty if missing or tampered with"""
+    if 'guest_cart' not in g:
+        items = {}
+        cookie = request.cookies.get(COOKIE_NAME)
+        if cookie:
+            try:
+                items = {int(book_id): int(quantity)
+                         for book_id, quantity in _serializer().loads(cookie)
+                         if int(quantity) > 0}
+            except (BadSignature, ValueError, TypeError):
+                items = {}
+        g.guest_cart = items
+    return g.guest_cart
+
+
+def save_guest_cart(items):
+    """Write the cart back to the cookie when the response goes out (deleted once empty)"""
+    first_write = 'guest_cart_dirty' not in g
+    g.guest_cart = items
+    g.guest_cart_dirty = True
+    if not first_write:
+        return
+
+    @after_this_request
+    def write_cookie(response):
+        items = g.guest_cart
+        if not items:
+            response.delete_cookie(COOKIE_NAME)
+            return response
+        # [[book_id, quantity], ...]: a few bytes per line, signed but not stored server-side
+        response.set_cookie(
+            COOKIE_NAME, _serializer().dumps(sorted(items.items())),
+            max_age=current_app.config.get('GUEST_CART_MAX_AGE', 30 * 24 * 3600),
+            secure=current_app.config.get('SESSION_COOKIE_SECURE', False),
+            httponly=True, samesite='Lax'
+        )
+        return response
+
+
+def guest_cart_lines():
+    """``[(GuestCartLine, CachedBook)]`` for the cart page, served from the catalog cache"""
+    lines = []
+    for book_id, quantity in load_guest_cart().items():
+        book = catalog_cache.get_book(book_id)
+        if book is not None:
+            lines.append((GuestCartLine(book_id, quantity), book))
+    return lines
+
+
+def guest_cart_summary():
+    """Navbar summary ``{'count', 'total'}`` of the guest cart (no query once cached)"""
+    lines = guest_cart_lines()
+    return {'count': len(lines),
+            'total': round(sum(line.quantity * book.price for line, book in lines), 2)}
+
+
+def add_guest_item(book_id, quantity):
+    """Guest counterpart of ``cart_service.add_item``: same checks and return
+    value ``(line quantity, book price, created)``, written to the cookie"""
+    if quantity < 1:
+        raise CartError('Quantity must be at least 1')
+
+    book = catalog_cache.get_book(book_id)
+    if book is None:
+        raise CartError('Book not found', status=404)
+
+    items = dict(load_guest_cart())
+    in_cart = items.get(book_id, 0)
+    stock = catalog_cache.stock_levels([book_id]).get(book_id, 0)
+    if in_cart + quantity > stock:
+        if in_cart:
+            raise CartError(f'Cannot add {quantity} more. Only {max(stock - in_cart, 0)} items available')
+        raise CartError(f'Only {stock} items available in stock')
+    if not in_cart and len(items) >= current_app.config.get('GUEST_CART_MAX_LINES', 50):
+        raise CartError('Your cart is full. Please login to add more books')
+
+    items[book_id] = in_cart + quantity
+    save_guest_cart(items)
+    return items[book_id], book.price, not in_cart
+
+
+def apply_guest_changes(operations):
+    """Guest counterpart of ``cart_service.apply_changes``, where ``cart_id`` is
+    the book id. Returns ``(lines, removed, amount)``."""
+    quantities = parse_changes(operations)
+    items = dict(load_guest_cart())
+    if any(book_id not in items for book_id in quantities):
+        raise CartError('Some cart items no longer exist', status=404)
+
+    books = {book_id: catalog_cache.get_book(book_id) for book_id in quantities}
+    stock = catalog_cache.stock_levels(quantities)
+    errors = [
+        f'Only {stock.get(book_id, 0)} of "{book.title}" available'
+        for book_id, book in books.items()
+        if book is not None and quantities[book_id] > stock.get(book_id, 0)
+    ]
+    if errors:
+        raise CartError('; '.join(errors))
+
+    lines = []
+    removed = 0
+    amount = 0.0
+    for book_id, quantity in quantities.items():
+        book = books[book_id]
+        price = book.price if book is not None else 0
+        amount += (quantity - items[book_id]) * price
+        if quantity == 0 or book is None:
+            del items[book_id]
+            removed += 1
+            quantity = 0
+        else:
+            items[book_id] = quantity
+        lines.append({'cart_id': book_id, 'quantity': quantity, 'line_total': round(quantity * price, 2)})
+
+    save_guest_cart(items)
+    return lines, removed, amount
+
+
+def clear_guest_cart():
+    save_guest_cart({})
+
+
+def merge_guest_cart(user_id):
+    """Move the guest cart into the user's Cart rows with one bulk upsert and
+    drop the cookie. Call at login, before the login's commit."""
+    items = load_guest_cart()
+    if not items:
+        return 0
+    merged = merge_items(user_id, items)
+    clear_guest_cart()
+    return merged
@@ -0,0 +1,63 @@
+import hashlib
+from datetime import timezone
+from functools import wraps
+from flask import request, session, make_response
+from app.utils.guest_cart import COOKIE_NAME as GUEST_CART_COOKIE
+
+
+def _etag(version):
+    """Hash of the resource version plus the session state that changes what a page
+    renders (navbar and cart badge, CSRF token; a guest's badge comes from the cart cookie)"""
+    viewer = '|'.join(str(session.get(key, '')) for key in ('user_id', 'role', 'csrf_token', 'cart_summary'))
+    viewer += '|' + request.cookies.get(GUEST_CART_COOKIE, '')
+    return hashlib.sha1(f'{version}|{viewer}'.encode()).hexdigest()
+
+
+def _http_date(value):
+    """Naive UTC datetime -> aware, second precision (HTTP dates have no microseconds)"""
+    if value is None:
+        return None
+    return value.replace(tzinfo=timezone.utc, microsecond=0)
+
+
+def conditional_get(validators):
+    """Answer repeat GETs with 304 Not Modified when the underlying data hasn't changed.
+
+    ``validators(**view_args)`` returns ``(version, last_modified)`` for the
+    resource, or None when it can't tell (the view then runs normally). It is
+    called before the view, so a 304 costs no template rendering and, when the
+    validators come from a cache, no database query. Responses are marked
+    ``private, no-cache`` because pages embed per-session content.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            # Pending flash messages must be rendered, never answered with 304
+            if request.method != 'GET' or session.get('_flashes'):
+                return f(*args, **kwargs)
+
+            resource = validators(**kwargs)
+            if resource is None:
+                return f(*args, **kwargs)
+
+            version, last_modified = resource
+            last_modified = _http_date(last_modified)
+
+            if request.if_none_match:
+                fresh = request.if_none_match.contains_weak(_etag(version))
+            elif request.if_modified_since and last_modified:
+                fresh = last_modified <= request.if_modified_since
+            else:
+                fresh = False
+
+            response = make_response('', 304) if fresh else make_response(f(*args, **kwargs))
+            if response.status_code in (200, 304):
+                # Computed after rendering, which may have issued a CSRF token
+                response.set_etag(_etag(version), weak=True)
+                if last_modified:
+                    response.last_modified = last_modified
+                response.cache_control.private = True
+                response.cache_control.no_cache = True
+            return response
+        return decorated_function
+    return decorator
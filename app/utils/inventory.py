@@ -0,0 +1,102 @@
+from collections import defaultdict
+from datetime import datetime
+from sqlalchemy import case, func, insert, update
+from app import db
+from app.models import Book, OrderItem, StockLedger
+from app.utils.catalog_cache import catalog_cache
+
+
+class InsufficientStock(ValueError):
+    """A stock change that would have taken a book below zero; nothing was written"""
+
+    def __init__(self, shortages):
+        self.shortages = shortages  # [(book_id, title, stock, requested)]
+        super().__init__('Insufficient stock for ' + ', '.join(
+            f'{title} ({stock} left, {requested} needed)' if title else f'book {book_id} (no longer sold)'
+            for book_id, title, stock, requested in shortages
+        ))
+
+
+def apply_stock_changes(changes, reason):
+    """Apply ``[(book_id, order_id, change)]`` stock deltas and record them in the ledger.
+
+    Deltas are summed per book and written with one UPDATE,
+    ``SET stock = stock + CASE id ... END WHERE id IN (...) AND
+    stock + CASE id ... END >= 0 RETURNING id``, so each row is checked and
+    changed atomically (no lost updates, never negative), followed by one
+    multi-row INSERT into stock_ledger. If any book fails the guard, the
+    savepoint around both is rolled back and InsufficientStock lists the
+    books that fell short. Does not commit.
+    """
+    changes = [(book_id, order_id, change) for book_id, order_id, change in changes if change]
+    if not changes:
+        return
+
+    deltas = defaultdict(int)
+    for book_id, order_id, change in changes:
+        deltas[book_id] += change
+
+    delta = case(dict(deltas), value=Book.id)
+    now = datetime.utcnow()
+    savepoint = db.session.begin_nested()
+    changed = set(db.session.scalars(
+        update(Book)
+        .where(Book.id.in_(list(deltas)), Book.stock + delta >= 0)
+        .values(stock=Book.stock + delta, updated_at=now)
+        .returning(Book.id)
+        # Books already loaded in the session get the new stock, so they can't write back a stale value
+        .execution_options(synchronize_session='fetch')
+    ))
+
+    if len(changed) != len(deltas):
+        savepoint.rollback()
+        raise InsufficientStock(_shortages(deltas, changed))
+
+    db.session.execute(insert(StockLedger), [
+        {'book_id': book_id, 'order_id': order_id, 'change': change,
+         'reason': reason, 'created_at': now}
+        for book_id, order_id, change in changes
+    ])
+    savepoint.commit()
+    catalog_cache.mark_stock_changed(db.session, deltas)
+
+
+def decrement_stock(quantities, order_id=None, reason='order'):
+    """Take ``{book_id: quantity}`` out of stock (see apply_stock_changes)"""
+    apply_stock_changes(
+        [(book_id, order_id, -quantity) for book_id, quantity in quantities.items()], reason
+    )
+
+
+def restock_orders(order_ids, reason):
+    """Put the stock of whole orders back (cancelled, refunded, declined)"""
+    apply_stock_changes(_order_lines(order_ids, 1), reason)
+
+
+def take_order_stock(order_ids, reason='reinstated'):
+    """Take the stock of whole orders out again, e.g. when a cancelled order is reinstated"""
+    apply_stock_changes(_order_lines(order_ids, -1), reason)
+
+
+def _order_lines(order_ids, sign):
+    """Every order's quantities per book, read with one grouped query"""
+    rows = db.session.query(
+        OrderItem.book_id, OrderItem.order_id, func.sum(OrderItem.quantity)
+    ).join(Book, Book.id == OrderItem.book_id).filter(
+        OrderItem.order_id.in_(list(order_ids))
+    ).group_by(
+        OrderItem.order_id, OrderItem.book_id
+    ).all()
+    return [(book_id, order_id, sign * quantity) for book_id, order_id, quantity in rows]
+
+
+def _shortages(deltas, changed):
+    """Which books failed the guard (only runs on the failure path)"""
+    missing = [book_id for book_id in deltas if book_id not in changed]
+    books = dict((book_id, (title, stock)) for book_id, title, stock in db.session.query(
+        Book.id, Book.title, Book.stock
+    ).filter(Book.id.in_(missing)).all())
+    return [
+        (book_id, *books.get(book_id, (None, 0)), -deltas[book_id])
+        for book_id in missing
+    ]
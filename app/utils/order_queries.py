@@ -0,0 +1,23 @@
+from sqlalchemy.orm import joinedload, selectinload
+from app.models import Order, OrderItem
+
+
+def with_customer(query):
+    """Load each order's user in the same query (admin order list)"""
+    return query.options(joinedload(Order.user))
+
+
+def with_lines(query):
+    """Load every order's items and their books with one extra query for the
+    whole page (``SELECT ... WHERE order_id IN (...)`` joined to book), instead
+    of one per order and one per item"""
+    return query.options(selectinload(Order.items).joinedload(OrderItem.book))
+
+
+def with_details(query):
+    """Customer, payment, items and books: two queries for any number of orders"""
+    return with_lines(query.options(joinedload(Order.user), joinedload(Order.payment)))
+
+
+def order_details_or_404(order_id):
+    return with_details(Order.query).filter(Order.id == order_id).first_or_404()
@@ -0,0 +1,109 @@
+from collections import defaultdict
+from datetime import datetime, timedelta
+from sqlalchemy import update
+from app import db, scheduler
+from app.models import Order
+from app.utils.dashboard_stats import dashboard_stats
+from app.utils.inventory import restock_orders, take_order_stock
+
+STATUSES = ('pending', 'in_progress', 'delivered', 'cancelled', 'delayed', 'refunded', 'backordered')
+
+# Orders in these statuses hold no stock: it was put back, or (backordered:
+# paid for while the books were short) never taken
+RELEASED = ('cancelled', 'refunded', 'backordered')
+
+# Scheduled per-order jobs an admin decision supersedes
+ORDER_JOB_PREFIXES = ('deliver_order_', 'delay_order_')
+
+
+class BulkStatusError(ValueError):
+    """A bulk transition that was rejected before anything was written"""
+
+
+def filtered_orders(status=None, created_from=None, created_to=None):
+    """Orders matching the admin list filter: a status and/or an inclusive
+    ``YYYY-MM-DD`` range of order dates"""
+    query = Order.query
+    if status:
+        if status not in STATUSES:
+            raise BulkStatusError(f'Unknown status filter {status!r}')
+        query = query.filter(Order.status == status)
+    try:
+        if created_from:
+            query = query.filter(Order.created_at >= datetime.strptime(created_from, '%Y-%m-%d'))
+        if created_to:
+            query = query.filter(
+                Order.created_at < datetime.strptime(created_to, '%Y-%m-%d') + timedelta(days=1)
+            )
+    except ValueError:
+        raise BulkStatusError('Dates must be given as YYYY-MM-DD')
+    return query
+
+
+def transition_orders(query, new_status, max_orders):
+    """Move every order selected by ``query`` to ``new_status`` in the current transaction.
+
+    One read locks and fetches (id, status, total) for the selection; stock
+    is put back (active -> released) or taken (released -> active, see
+    RELEASED) with one aggregate UPDATE per call through
+    inventory, raising InsufficientStock if a reinstated order can no longer
+    be filled; the statuses change with one UPDATE and the dashboard
+    counters with one upsert per status. Does not commit; call
+    remove_order_jobs() once the caller has.
+
+    Returns ``{'matched', 'updated', 'order_ids', 'restocked', 'reinstated'}``.
+    """
+    if new_status not in STATUSES:
+        raise BulkStatusError(f'Invalid status {new_status!r}')
+
+    rows = query.with_entities(Order.id, Order.status, Order.total_amount) \
+        .order_by(Order.created_at, Order.id).limit(max_orders + 1).with_for_update().all()
+    if len(rows) > max_orders:
+        raise BulkStatusError(f'More than {max_orders} orders selected; narrow the filter')
+
+    changing = [(order_id, status, total) for order_id, status, total in rows if status != new_status]
+    order_ids = [order_id for order_id, status, total in changing]
+    result = {'matched': len(rows), 'updated': len(order_ids), 'order_ids': order_ids,
+              'restocked': 0, 'reinstated': 0}
+    if not changing:
+        return result
+
+    if new_status in RELEASED:
+        restock = [order_id for order_id, status, total in changing if status not in RELEASED]
+        restock_orders(restock, new_status)
+        result['restocked'] = len(restock)
+    else:
+        reinstate = [order_id for order_id, status, total in changing if status in RELEASED]
+        take_order_stock(reinstate)
+        result['reinstated'] = len(reinstate)
+
+    db.session.execute(
+        update(Order)
+        .where(Order.id.in_(order_ids))
+        .values(status=new_status)
+        .execution_options(synchronize_session='fetch')
+    )
+
+    # Bulk SQL skips the flush hooks that keep the dashboard counters
+    deltas = defaultdict(lambda: [0, 0.0])
+    for order_id, status, total in changing:
+        deltas[f'orders:{status}'][0] -= 1
+        deltas[f'orders:{status}'][1] -= total or 0
+        deltas[f'orders:{new_status}'][0] += 1
+        deltas[f'orders:{new_status}'][1] += total or 0
+    dashboard_stats.record(db.session, {key: tuple(delta) for key, delta in deltas.items()})
+    return result
+
+
+def remove_order_jobs(order_ids):
+    """Drop the scheduled delivery/delay jobs of these orders, listing the jobs once"""
+    wanted = {f'{prefix}{order_id}' for order_id in order_ids for prefix in ORDER_JOB_PREFIXES}
+    removed = 0
+    for job in scheduler.get_jobs():
+        if job.id in wanted:
+            try:
+                job.remove()
+                removed += 1
+            except Exception:
+                pass  # Already ran or was removed meanwhile
+    return removed
@@ -0,0 +1,124 @@
+import time
+from datetime import datetime
+from flask import current_app
+from itsdangerous import URLSafeSerializer, BadSignature
+from sqlalchemy import and_, or_
+
+
+class KeysetPagination:
+    """One page of a keyset (cursor) paginated listing ordered by (created_at, id) DESC.
+
+    Mirrors the parts of Flask-SQLAlchemy's Pagination used by our templates
+    (``items``, ``has_prev``, ``has_next``, ``total``) but exposes opaque
+    ``prev_cursor``/``next_cursor`` values instead of page numbers, so every
+    page costs one indexed range query no matter how deep it is.
+    """
+
+    cursor_mode = True
+
+    def __init__(self, query, items, per_page, has_prev, has_next, count_key=None, known_total=None):
+        self.query = query
+        self.items = items
+        self.per_page = per_page
+        self.has_prev = has_prev
+        self.has_next = has_next
+        self.count_key = count_key
+        self.known_total = known_total
+
+    @property
+    def prev_cursor(self):
+        return encode_cursor(self.items[0]) if self.has_prev and self.items else None
+
+    @property
+    def next_cursor(self):
+        return encode_cursor(self.items[-1]) if self.has_next and self.items else None
+
+    @property
+    def total(self):
+        """Total row count, computed only when a template asks for it and cached briefly"""
+        if self.known_total is not None:
+            return self.known_total
+        if self.count_key is None:
+            return self.query.order_by(None).count()
+        return count_cache.get_or_compute(self.count_key, lambda: self.query.order_by(None).count())
+
+
+class CountCache:
+    """Small TTL cache for listing totals so COUNT(*) runs at most once per window"""
+
+    def __init__(self, max_entries=1024):
+        self.entries = {}
+        self.max_entries = max_entries
+
+    def get_or_compute(self, key, compute):
+        now = time.time()
+        entry = self.entries.get(key)
+        if entry and entry[0] > now:
+            return entry[1]
+
+        if len(self.entries) >= self.max_entries:
+            # Drop expired totals (per-user keys would otherwise accumulate)
+            self.entries = {k: v for k, v in self.entries.items() if v[0] > now}
+
+        value = compute()
+        ttl = current_app.config.get('PAGINATION_COUNT_CACHE_SECONDS', 60)
+        self.entries[key] = (now + ttl, value)
+        return value
+
+
+count_cache = CountCache()
+
+
+def _serializer():
+    return URLSafeSerializer(current_app.config['SECRET_KEY'], salt='pagination-cursor')
+
+
+def encode_cursor(item):
+    """Opaque, signed cursor for a row's (created_at, id) position"""
+    return _serializer().dumps([item.created_at.isoformat(), item.id])
+
+
+def decode_cursor(cursor):
+    """Return (created_at, id) for a cursor, or None if it is missing or tampered with"""
+    if not cursor:
+        return None
+    try:
+        created_at, row_id = _serializer().loads(cursor)
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (BadSignature, ValueError, TypeError):
+        return None
+
+
+def keyset_paginate(query, model, per_page, after=None, before=None, count_key=None, total=None):
+    """Paginate ``query`` newest-first on (model.created_at, model.id).
+
+    ``after`` fetches the page following a ``next_cursor`` and ``before`` the
+    page preceding a ``prev_cursor``; with neither, the first page is returned.
+    Pass ``total`` when the caller already knows the row count.
+    """
+    after_key = decode_cursor(after)
+    before_key = decode_cursor(before)
+
+    if before_key:
+        created_at, row_id = before_key
+        rows = query.filter(
+            or_(model.created_at > created_at,
+                and_(model.created_at == created_at, model.id > row_id))
+        ).order_by(model.created_at.asc(), model.id.asc()).limit(per_page + 1).all()
+
+        has_prev = len(rows) > per_page
+        items = list(reversed(rows[:per_page]))
+        return KeysetPagination(query, items, per_page, has_prev, True, count_key, total)
+
+    if after_key:
+        created_at, row_id = after_key
+        query_page = query.filter(
+            or_(model.created_at < created_at,
+                and_(model.created_at == created_at, model.id < row_id))
+        )
+    else:
+        query_page = query
+
+    rows = query_page.order_by(model.created_at.desc(), model.id.desc()).limit(per_page + 1).all()
+    has_next = len(rows) > per_page
+    return KeysetPagination(query, rows[:per_page], per_page, bool(after_key), has_next, count_key, total)
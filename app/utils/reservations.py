@@ -0,0 +1,181 @@
+import uuid
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import delete, func, insert, update
+from app import db
+from app.models import Book, StockReservation
+
+
+SWEEP_JOB_ID = 'release_expired_reservations'
+
+# Stripe checkout sessions must last at least 30 minutes (plus slack for clock
+# differences); a hold is never shorter, so a session can't outlive its hold
+MIN_HOLD = timedelta(minutes=31)
+
+
+class ReservationError(ValueError):
+    """Not enough unreserved stock to hold a checkout"""
+
+
+def init_app(app, scheduler):
+    """Schedule the sweeper that releases expired holds"""
+    def sweep():
+        with app.app_context():
+            release_expired()
+
+    scheduler.add_job(
+        id=SWEEP_JOB_ID, func=sweep, trigger='interval',
+        seconds=app.config.get('RESERVATION_SWEEP_SECONDS', 60), replace_existing=True
+    )
+
+
+def hold_duration():
+    """RESERVATION_HOLD_MINUTES, but at least MIN_HOLD"""
+    return max(timedelta(minutes=current_app.config['RESERVATION_HOLD_MINUTES']), MIN_HOLD)
+
+
+def _active(now):
+    return (StockReservation.status == 'active', StockReservation.expires_at > now)
+
+
+def reserved_quantities(book_ids, now=None, exclude_user_id=None):
+    """{book_id: quantity held by active, unexpired reservations} in one grouped
+    query on ix_reservation_book_status_expires"""
+    now = now or datetime.utcnow()
+    query = db.session.query(
+        StockReservation.book_id, func.sum(StockReservation.quantity)
+    ).filter(StockReservation.book_id.in_(book_ids), *_active(now))
+    if exclude_user_id is not None:
+        query = query.filter(StockReservation.user_id != exclude_user_id)
+    return dict(query.group_by(StockReservation.book_id).all())
+
+
+def available_stock(book_ids, exclude_user_id=None):
+    """{book_id: stock minus active holds}; ``exclude_user_id`` ignores that
+    user's own holds (which their next checkout replaces)"""
+    stock = dict(db.session.query(Book.id, Book.stock).filter(Book.id.in_(book_ids)).all())
+    held = reserved_quantities(book_ids, exclude_user_id=exclude_user_id)
+    return {book_id: (count or 0) - held.get(book_id, 0) for book_id, count in stock.items()}
+
+
+def reserve(user_id, quantities, prices):
+    """Hold ``{book_id: quantity}`` for one checkout at ``{book_id: unit price}``;
+    returns ``(reference, expires_at)``. The holds are also the checkout's
+    record of what is being bought (see checkout_lines).
+
+    Any earlier active holds of the user are released first (a retried
+    checkout replaces the old one). The book rows are locked (FOR UPDATE on
+    Postgres; SQLite serialises writers) while availability is checked and the
+    holds are inserted, so two checkouts cannot both take the last copy.
+    Raises ReservationError listing the books that fall short. Commits.
+    """
+    now = datetime.utcnow()
+    expires_at = now + hold_duration()
+    reference = str(uuid.uuid4())
+    book_ids = sorted(quantities)
+
+    try:
+        _release(StockReservation.user_id == user_id)
+
+        books = db.session.query(Book.id, Book.title, Book.stock).filter(
+            Book.id.in_(book_ids)
+        ).order_by(Book.id).with_for_update().all()
+        held = reserved_quantities(book_ids, now)
+
+        shortages = []
+        for book_id, title, stock in books:
+            available = (stock or 0) - held.get(book_id, 0)
+            if available < quantities[book_id]:
+                shortages.append(f'{title} (only {max(available, 0)} available)')
+        if len(books) != len(book_ids):
+            shortages.append('a book that is no longer sold')
+        if shortages:
+            raise ReservationError('Insufficient stock for ' + ', '.join(shortages))
+
+        db.session.execute(insert(StockReservation), [
+            {'reference': reference, 'user_id': user_id, 'book_id': book_id,
+             'quantity': quantities[book_id], 'price': prices[book_id], 'status': 'active',
+             'expires_at': expires_at, 'created_at': now}
+            for book_id in book_ids
+        ])
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    return reference, expires_at
+
+
+def checkout_lines(reference):
+    """``[(book_id, quantity, unit price)]`` a checkout was started with, whatever
+    has happened to its holds since (they are kept RESERVATION_PURGE_DAYS)"""
+    return db.session.query(
+        StockReservation.book_id, StockReservation.quantity,
+        func.coalesce(StockReservation.price, Book.price)
+    ).join(Book, Book.id == StockReservation.book_id).filter(
+        StockReservation.reference == reference
+    ).order_by(StockReservation.book_id).all()
+
+
+def convert(reference):
+    """Mark a checkout's holds as fulfilled (the caller decrements stock in the
+    same transaction). Returns the number of holds converted; 0 means they had
+    already expired or been released. Does not commit."""
+    result = db.session.execute(
+        update(StockReservation)
+        .where(StockReservation.reference == reference, StockReservation.status == 'active')
+        .values(status='converted')
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount
+
+
+def release(reference):
+    """Release a checkout's holds (abandoned/expired session). Does not commit."""
+    return _release(StockReservation.reference == reference)
+
+
+def release_expired():
+    """Sweeper: release every expired hold in one UPDATE, and delete holds that
+    ended more than RESERVATION_PURGE_DAYS ago"""
+    now = datetime.utcnow()
+    try:
+        released = _release(StockReservation.expires_at <= now)
+        purge_before = now - timedelta(days=current_app.config.get('RESERVATION_PURGE_DAYS', 7))
+        db.session.execute(
+            delete(StockReservation)
+            .where(StockReservation.status.in_(['converted', 'released']),
+                   StockReservation.expires_at < purge_before)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return released
+
+
+def delete_book_holds(book_id):
+    """Delete a book's finished holds so the book can be deleted. Returns False,
+    deleting nothing, while a checkout still holds it. Does not commit."""
+    held = db.session.query(StockReservation.id).filter(
+        StockReservation.book_id == book_id, *_active(datetime.utcnow())
+    ).first()
+    if held:
+        return False
+    db.session.execute(
+        delete(StockReservation)
+        .where(StockReservation.book_id == book_id)
+        .execution_options(synchronize_session=False)
+    )
+    return True
+
+
+def _release(condition):
+    result = db.session.execute(
+        update(StockReservation)
+        .where(condition, StockReservation.status == 'active')
+        .values(status='released')
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount
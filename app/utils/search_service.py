@@ -0,0 +1,108 @@
+import re
+from sqlalchemy import inspect, text, func, literal_column, false
+from app import db
+from app.models import Book, GenreEnum
+
+
+# Column weights used for relevance ranking (title > author > genre)
+TITLE_WEIGHT = 10.0
+AUTHOR_WEIGHT = 5.0
+GENRE_WEIGHT = 1.0
+
+MAX_TERMS = 8
+
+
+class SearchService:
+    """Full-text search over the book catalog.
+
+    SQLite uses the ``book_fts`` FTS5 table and Postgres uses the
+    ``book.search_vector`` tsvector column. Both are created and kept in sync
+    with ``book`` by database triggers (see the ``book full-text search``
+    migration), so every insert/update/delete is indexed, including bulk SQL.
+    Genres are indexed by their label ("Non-Fiction"), as users see and type them.
+    """
+
+    def __init__(self):
+        self._available = {}
+
+    def tokenize(self, search):
+        """Split user input into safe lowercase search terms"""
+        terms = re.findall(r'\w+', (search or '').lower())
+        return terms[:MAX_TERMS]
+
+    def index_available(self):
+        """Check (once per engine) whether the full-text index has been migrated"""
+        engine = db.engine
+        key = str(engine.url)
+        if key not in self._available:
+            inspector = inspect(engine)
+            if engine.dialect.name == 'sqlite':
+                self._available[key] = inspector.has_table('book_fts')
+            elif engine.dialect.name == 'postgresql':
+                columns = [c['name'] for c in inspector.get_columns('book')]
+                self._available[key] = 'search_vector' in columns
+            else:
+                self._available[key] = False
+        return self._available[key]
+
+    def filter_books(self, query, search, match_all=True):
+        """Restrict a Book query to matches for ``search``, best matches first.
+
+        Every term is treated as a prefix, so "pyth prog" finds
+        "Python Programming". With ``match_all=False`` any term may match,
+        which suits free-form chatbot messages.
+        """
+        terms = self.tokenize(search)
+        if not terms:
+            return query.filter(false())
+
+        if not self.index_available():
+            return self._filter_books_ilike(query, terms, match_all)
+
+        if db.engine.dialect.name == 'sqlite':
+            return self._filter_books_fts5(query, terms, match_all)
+        return self._filter_books_tsvector(query, terms, match_all)
+
+    def _filter_books_fts5(self, query, terms, match_all):
+        """SQLite FTS5 MATCH ranked by weighted bm25"""
+        joiner = ' AND ' if match_all else ' OR '
+        match = joiner.join(f'"{term}"*' for term in terms)
+
+        matches = text(
+            'SELECT rowid AS book_id, '
+            f'bm25(book_fts, {TITLE_WEIGHT}, {AUTHOR_WEIGHT}, {GENRE_WEIGHT}) AS rank '
+            'FROM book_fts WHERE book_fts MATCH :match'
+        ).bindparams(match=match).columns(
+            literal_column('book_id'), literal_column('rank')
+        ).subquery('book_matches')
+
+        # bm25() is lower-is-better
+        return query.join(matches, matches.c.book_id == Book.id).order_by(
+            matches.c.rank, Book.created_at.desc(), Book.id.desc()
+        )
+
+    def _filter_books_tsvector(self, query, terms, match_all):
+        """Postgres tsvector/GIN match ranked by ts_rank"""
+        joiner = ' & ' if match_all else ' | '
+        tsquery = func.to_tsquery('simple', joiner.join(f'{term}:*' for term in terms))
+        vector = literal_column('book.search_vector')
+
+        return query.filter(vector.op('@@')(tsquery)).order_by(
+            func.ts_rank(vector, tsquery).desc(), Book.created_at.desc(), Book.id.desc()
+        )
+
+    def _filter_books_ilike(self, query, terms, match_all):
+        """Fallback for databases without the full-text index"""
+        conditions = [
+            db.or_(
+                Book.title.ilike(f'%{term}%'),
+                Book.author.ilike(f'%{term}%'),
+                Book.genre.in_([genre for genre in GenreEnum if term in genre.value.lower()])
+            )
+            for term in terms
+        ]
+        combined = db.and_(*conditions) if match_all else db.or_(*conditions)
+        return query.filter(combined).order_by(Book.created_at.desc(), Book.id.desc())
+
+
+search_service = SearchService()
@@ -0,0 +1,126 @@
+import re
+import threading
+from bisect import bisect_left, insort
+from app import db
+from app.models import Book
+from app.utils.catalog_cache import catalog_cache
+
+
+MAX_QUERY_LENGTH = 100
+
+
+def normalize(value):
+    """Lowercase and collapse everything but letters/digits to single spaces"""
+    return ' '.join(re.findall(r'\w+', (value or '').lower()))
+
+
+class SuggestIndex:
+    """In-memory prefix index over book titles and authors for typeahead.
+
+    Keys live in one sorted list of ``(key, book_id)`` tuples, so a lookup is a
+    ``bisect`` plus a short forward scan. Every word boundary of a title or
+    author is a key ("the python cookbook", "python cookbook", "cookbook"),
+    so typing any word finds the book. The index follows catalog_cache
+    invalidations: books changed by this worker are re-read on the next lookup,
+    and a change made by another worker triggers a full rebuild.
+    """
+
+    def __init__(self):
+        self.entries = []
+        self.keys_by_book = {}
+        self.books = {}
+        self.pending = set()
+        self.stale = True
+        self.lock = threading.Lock()
+        catalog_cache.subscribe(self.invalidate)
+
+    def invalidate(self, book_ids=None):
+        with self.lock:
+            if book_ids is None:
+                self.stale = True
+            else:
+                self.pending.update(book_ids)
+
+    def suggest(self, query, limit=8):
+        """Books whose title or author has a word starting with ``query``"""
+        prefix = normalize(query[:MAX_QUERY_LENGTH])
+        if not prefix:
+            return []
+
+        # Picks up writes from other workers (bounded by the catalog cache check interval)
+        catalog_cache.version()
+        self._refresh()
+
+        results = []
+        seen = set()
+        with self.lock:
+            position = bisect_left(self.entries, (prefix,))
+            while position < len(self.entries) and len(results) < limit:
+                key, book_id = self.entries[position]
+                if not key.startswith(prefix):
+                    break
+                if book_id not in seen:
+                    seen.add(book_id)
+                    title, author = self.books[book_id]
+                    results.append({'id': book_id, 'title': title, 'author': author})
+                position += 1
+        return results
+
+    def _refresh(self):
+        with self.lock:
+            stale = self.stale
+            pending = self.pending
+            self.stale = False
+            self.pending = set()
+
+        if stale:
+            rows = db.session.query(Book.id, Book.title, Book.author).all()
+            self._rebuild(rows)
+        elif pending:
+            rows = db.session.query(Book.id, Book.title, Book.author).filter(Book.id.in_(pending)).all()
+            self._update(pending, rows)
+
+    def _keys(self, title, author):
+        keys = set()
+        for text in (normalize(title), normalize(author)):
+            words = text.split(' ')
+            for start in range(len(words)):
+                keys.add(' '.join(words[start:]))
+        keys.discard('')
+        return keys
+
+    def _rebuild(self, rows):
+        entries = []
+        keys_by_book = {}
+        books = {}
+        for book_id, title, author in rows:
+            keys = self._keys(title, author)
+            keys_by_book[book_id] = keys
+            books[book_id] = (title, author)
+            entries.extend((key, book_id) for key in keys)
+        entries.sort()
+
+        with self.lock:
+            self.entries = entries
+            self.keys_by_book = keys_by_book
+            self.books = books
+
+    def _update(self, book_ids, rows):
+        """Replace the entries of changed books; ids missing from ``rows`` were deleted"""
+        with self.lock:
+            for book_id in book_ids:
+                for key in self.keys_by_book.pop(book_id, ()):
+                    position = bisect_left(self.entries, (key, book_id))
+                    if position < len(self.entries) and self.entries[position] == (key, book_id):
+                        del self.entries[position]
+                self.books.pop(book_id, None)
+
+            for book_id, title, author in rows:
+                keys = self._keys(title, author)
+                self.keys_by_book[book_id] = keys
+                self.books[book_id] = (title, author)
+                for key in keys:
+                    insort(self.entries, (key, book_id))
+
+
+suggest_index = SuggestIndex()
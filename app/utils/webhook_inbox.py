@@ -0,0 +1,154 @@
+import json
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import update
+from sqlalchemy.dialects import postgresql, sqlite
+from app import db
+from app.models import StripeEvent
+
+
+DRAIN_JOB_ID = 'drain_stripe_events'
+
+# Event type -> handler(event object); registered with @handles
+_handlers = {}
+
+
+def handles(event_type):
+    """Register the function that processes one event type.
+
+    Handlers get the event's ``data.object`` and must not commit: the worker
+    commits their writes together with marking the event processed, which is
+    what makes processing exactly-once.
+    """
+    def register(func):
+        _handlers[event_type] = func
+        return func
+    return register
+
+
+def init_app(app, scheduler):
+    """Schedule the worker that drains the inbox"""
+    def drain_job():
+        with app.app_context():
+            drain()
+
+    scheduler.add_job(
+        id=DRAIN_JOB_ID, func=drain_job, trigger='interval',
+        seconds=app.config.get('STRIPE_INBOX_POLL_SECONDS', 5),
+        max_instances=1, coalesce=True, replace_existing=True
+    )
+
+
+def store(event):
+    """Record a verified event once (redeliveries are ignored) and commit.
+
+    Returns False for event types nobody handles, which are not stored.
+    """
+    if event['type'] not in _handlers:
+        return False
+
+    now = datetime.utcnow()
+    insert = postgresql.insert if db.engine.dialect.name == 'postgresql' else sqlite.insert
+    db.session.execute(
+        insert(StripeEvent).values(
+            id=event['id'], type=event['type'], payload=json.dumps(event),
+            status='pending', attempts=0, received_at=now, next_attempt_at=now
+        ).on_conflict_do_nothing(index_elements=['id'])
+    )
+    db.session.commit()
+    return True
+
+
+def drain(batch_size=None):
+    """Process due events, longest due first, one transaction per event.
+
+    Each event is claimed with a conditional UPDATE in the same transaction
+    as its handler's writes, so concurrent workers (one scheduler per
+    gunicorn worker) never process an event twice and a crash leaves it
+    pending. Failures are retried with backoff, then marked failed.
+    Returns the number of events processed.
+    """
+    batch_size = batch_size or current_app.config.get('STRIPE_INBOX_BATCH_SIZE', 50)
+    processed = 0
+    while True:
+        event_ids = [event_id for event_id, in db.session.query(StripeEvent.id).filter(
+            StripeEvent.status == 'pending', StripeEvent.next_attempt_at <= datetime.utcnow()
+        ).order_by(StripeEvent.next_attempt_at).limit(batch_size).all()]
+        db.session.rollback()  # End the read transaction before the per-event ones
+
+        batch_processed = sum(_process(event_id) for event_id in event_ids)
+        processed += batch_processed
+        # A short batch was the last; an idle one means the rest is claimed or failing
+        if len(event_ids) < batch_size or not batch_processed:
+            return processed
+
+
+def _process(event_id):
+    now = datetime.utcnow()
+    try:
+        claimed = db.session.execute(
+            update(StripeEvent)
+            .where(StripeEvent.id == event_id, StripeEvent.status == 'pending',
+                   StripeEvent.next_attempt_at <= now)
+            .values(attempts=StripeEvent.attempts + 1)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if not claimed:
+            db.session.rollback()  # Another worker has it
+            return 0
+
+        event_type, payload = db.session.query(StripeEvent.type, StripeEvent.payload).filter(
+            StripeEvent.id == event_id
+        ).one()
+        _handlers[event_type](json.loads(payload)['data']['object'])
+
+        db.session.execute(
+            update(StripeEvent)
+            .where(StripeEvent.id == event_id)
+            .values(status='processed', processed_at=datetime.utcnow(), last_error=None)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        return 1
+    except Exception as e:
+        db.session.rollback()
+        _record_failure(event_id, e)
+        return 0
+
+
+def failed_count():
+    """Events that used up their attempts (shown on the admin dashboard)"""
+    return db.session.query(StripeEvent.id).filter(StripeEvent.status == 'failed').count()
+
+
+def requeue_failed():
+    """Give every failed event a fresh set of attempts. Commits."""
+    retried = db.session.execute(
+        update(StripeEvent)
+        .where(StripeEvent.status == 'failed')
+        .values(status='pending', attempts=0, next_attempt_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.session.commit()
+    return retried
+
+
+def _record_failure(event_id, error):
+    max_attempts = current_app.config.get('STRIPE_INBOX_MAX_ATTEMPTS', 8)
+    event = db.session.get(StripeEvent, event_id)
+    if event is None:
+        return
+    event.attempts += 1  # The claim was rolled back with the handler's writes
+    event.last_error = f'{type(error).__name__}: {error}'
+    if event.attempts >= max_attempts:
+        event.status = 'failed'
+    else:
+        # 30s, 1m, 2m, 4m, ...
+        event.next_attempt_at = datetime.utcnow() + timedelta(seconds=30 * 2 ** (event.attempts - 1))
+    db.session.commit()
+    if event.status == 'failed':
+        current_app.logger.error('Stripe event %s (%s) failed after %s attempts, giving up: %s',
+                                 event_id, event.type, event.attempts, error)
+    else:
+        current_app.logger.warning('Stripe event %s (%s) failed (attempt %s), retrying at %s: %s',
+                                   event_id, event.type, event.attempts, event.next_attempt_at, error)
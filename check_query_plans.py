@@ -0,0 +1,116 @@
+"""Fail if any hot query falls back to a full table scan.
+
+Migrates a throwaway SQLite database to head, runs EXPLAIN QUERY PLAN on the
+queries behind the catalog, cart, wishlist and order pages, and exits non-zero
+if a plan scans a table or sorts with a temporary B-tree.
+
+Usage: python check_query_plans.py
+"""
+import os
+import sys
+import tempfile
+from datetime import datetime
+from flask_migrate import upgrade
+from sqlalchemy import text, func
+from sqlalchemy.dialects import sqlite
+from app import create_app, db
+from app.config import Config
+from app.models import Book, Cart, Wishlist, Order, OrderItem, Payment, StockReservation, StripeEvent, GenreEnum
+
+basedir = os.path.abspath(os.path.dirname(__file__))
+db_fd, db_path = tempfile.mkstemp(suffix='.db')
+os.close(db_fd)
+
+
+class PlanCheckConfig(Config):
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///' + db_path
+
+
+def hot_queries():
+    """(name, query) pairs for every lookup on a request path"""
+    now = datetime.utcnow()
+    return [
+        ('cart item lookup', Cart.query.filter_by(user_id=1, book_id=1)),
+        ('cart with books', db.session.query(Cart, Book).join(Book).filter(Cart.user_id == 1)),
+        ('cart count', Cart.query.filter_by(user_id=1).order_by(None).with_entities(Cart.id)),
+        ('wishlist item lookup', Wishlist.query.filter_by(user_id=1, book_id=1)),
+        ('wishlist with books', db.session.query(Wishlist, Book).join(Book).filter(Wishlist.user_id == 1)),
+        ('recent books', Book.query.order_by(Book.created_at.desc()).limit(6)),
+        ('books page after cursor', Book.query.filter(
+            db.or_(Book.created_at < now, db.and_(Book.created_at == now, Book.id < 10))
+        ).order_by(Book.created_at.desc(), Book.id.desc()).limit(9)),
+        ('books in genre', Book.query.filter(Book.genre == GenreEnum.FICTION)
+            .order_by(Book.created_at.desc(), Book.id.desc()).limit(9)),
+        ('catalog stock stamp', db.session.query(func.max(Book.updated_at))),
+        ('books with new stock', db.session.query(Book.id).filter(Book.updated_at > now)),
+        ('import lookup', db.session.query(Book.id, Book.title, Book.author).filter(
+            Book.title.in_(['a', 'b']))),
+        ('user orders', Order.query.filter_by(user_id=1).order_by(Order.created_at.desc()).limit(11)),
+        ('orders by status', Order.query.filter_by(status='delayed').order_by(Order.created_at.desc()).limit(11)),
+        ('all orders', Order.query.order_by(Order.created_at.desc()).limit(11)),
+        ('order items', OrderItem.query.filter_by(order_id=1)),
+        ('book has orders', OrderItem.query.filter_by(book_id=1).limit(1)),
+        ('order payment', Payment.query.filter_by(order_id=1)),
+        ('reserved stock', db.session.query(StockReservation.book_id, func.sum(StockReservation.quantity))
+            .filter(StockReservation.book_id.in_([1, 2]), StockReservation.status == 'active',
+                    StockReservation.expires_at > now).group_by(StockReservation.book_id)),
+        ('expired reservations', StockReservation.query.filter(
+            StockReservation.status == 'active', StockReservation.expires_at <= now)),
+        ('finished reservations', StockReservation.query.filter(
+            StockReservation.status.in_(['converted', 'released']), StockReservation.expires_at < now)),
+        ('book reservations', StockReservation.query.filter(
+            StockReservation.book_id == 1, StockReservation.status == 'active', StockReservation.expires_at > now)),
+        ('checkout reservations', StockReservation.query.filter_by(reference='x', status='active')),
+        ('bulk status by filter', Order.query.filter(
+            Order.status == 'in_progress', Order.created_at >= now, Order.created_at < now
+        ).with_entities(Order.id, Order.status, Order.total_amount)
+            .order_by(Order.created_at, Order.id).limit(1001)),
+        ('bulk status by date', Order.query.filter(Order.created_at >= now, Order.created_at < now)
+            .with_entities(Order.id, Order.status, Order.total_amount)
+            .order_by(Order.created_at, Order.id).limit(1001)),
+        ('failed stripe events', db.session.query(StripeEvent.id).filter(StripeEvent.status == 'failed')),
+        ('stripe inbox batch', db.session.query(StripeEvent.id).filter(
+            StripeEvent.status == 'pending', StripeEvent.next_attempt_at <= now
+        ).order_by(StripeEvent.next_attempt_at).limit(50)),
+    ]
+
+
+def problems_in(plan_rows):
+    """Plan lines that mean a full scan or an unindexed sort"""
+    problems = []
+    for row in plan_rows:
+        detail = row[-1]
+        if detail.startswith('SCAN') and 'USING' not in detail and 'CONSTANT ROW' not in detail:
+            problems.append(detail)
+        elif 'TEMP B-TREE' in detail:
+            problems.append(detail)
+    return problems
+
+
+def main():
+    app = create_app(PlanCheckConfig)
+    failures = 0
+
+    with app.app_context():
+        upgrade(directory=os.path.join(basedir, 'migrations'))
+
+        for name, query in hot_queries():
+            compiled = query.statement.compile(
+                dialect=sqlite.dialect(), compile_kwargs={'literal_binds': True}
+            )
+            plan = db.session.execute(text('EXPLAIN QUERY PLAN ' + str(compiled))).fetchall()
+            problems = problems_in(plan)
+
+            if problems:
+                failures += 1
+                print(f"FAIL {name}: {'; '.join(problems)}")
+            else:
+                print(f"ok   {name}: {'; '.join(row[-1] for row in plan)}")
+
+    os.remove(db_path)
+    print(f"\n{failures} hot quer{'y' if failures == 1 else 'ies'} without an index")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,254 @@
+"""Load-test checkout end to end against the offline Stripe stand-in.
+
+Starts the app (threaded WSGI server) on a throwaway database together with
+stripe_standin.py, seeds users and a few contended books, then drives N
+concurrent customers through login -> add to cart -> checkout session ->
+payment (signed webhook) -> success page. When the webhook inbox has drained
+it reports orders/second, p50/p99 latency per step and any anomalies:
+oversold or negative stock, duplicate orders/payments, paid checkouts
+without an order, backordered orders, stock that disagrees with the stock
+ledger, and failed webhook events. Exits non-zero if anomalies were found.
+
+Usage: python load_test_checkout.py [--users 200] [--concurrency 20] [--books 5]
+                                    [--stock 50] [--deliveries 2] [--abandon-rate 0.1]
+                                    [--database-url postgresql://...]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from werkzeug.serving import make_server
+from stripe_standin import StripeStandIn
+
+WEBHOOK_SECRET = 'whsec_standin'
+PASSWORD = 'load-test-password'
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--users', type=int, default=200, help='customers, each checking out once')
+    parser.add_argument('--concurrency', type=int, default=20)
+    parser.add_argument('--books', type=int, default=5, help='titles everyone competes for')
+    parser.add_argument('--stock', type=int, default=50, help='initial stock per title')
+    parser.add_argument('--quantity', type=int, default=1, help='copies per customer')
+    parser.add_argument('--deliveries', type=int, default=2, help='times Stripe delivers each event')
+    parser.add_argument('--abandon-rate', type=float, default=0.1, help='share of checkouts left to expire')
+    parser.add_argument('--database-url', help='default: a throwaway SQLite file')
+    parser.add_argument('--drain-timeout', type=int, default=120, help='seconds to wait for the inbox')
+    return parser.parse_args()
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+class Recorder:
+    """Thread-safe latencies per step and outcome counts"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.outcomes = defaultdict(int)
+        self.errors = defaultdict(int)
+
+    def timed(self, step, func, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            with self.lock:
+                self.latencies[step].append(time.perf_counter() - started)
+
+    def count(self, outcome, error=None):
+        with self.lock:
+            self.outcomes[outcome] += 1
+            if error:
+                self.errors[error[:120]] += 1
+
+
+def customer(base_url, standin, email, book_ids, args, recorder):
+    """One customer's trip through checkout; returns the Stripe session id if paid"""
+    http = requests.Session()
+    response = recorder.timed('login', http.post, f'{base_url}/auth/login',
+                              json={'email': email, 'password': PASSWORD})
+    if response.status_code != 200:
+        return recorder.count('login failed', f'login {response.status_code}')
+
+    book_id = random.choice(book_ids)
+    response = recorder.timed('add to cart', http.post, f'{base_url}/shop/add-to-cart/{book_id}',
+                              json={'quantity': args.quantity})
+    if not response.json().get('success'):
+        return recorder.count('sold out at cart', response.json().get('message'))
+
+    response = recorder.timed('checkout session', http.post, f'{base_url}/payment/create-checkout-session')
+    data = response.json()
+    if 'sessionId' not in data:
+        return recorder.count('sold out at checkout', data.get('error'))
+    session_id = data['sessionId']
+
+    if random.random() < args.abandon_rate:
+        recorder.timed('expire', requests.post, f'{standin.url}/_standin/checkout/sessions/{session_id}/expire')
+        return recorder.count('abandoned')
+
+    response = recorder.timed('pay + webhook', requests.post,
+                              f'{standin.url}/_standin/checkout/sessions/{session_id}/pay')
+    statuses = response.json()['webhook_statuses']
+    if any(status != 200 for status in statuses):
+        recorder.count('webhook error', f'webhook statuses {statuses}')
+
+    recorder.timed('success page', http.get, f'{base_url}/payment/success',
+                   params={'session_id': session_id}, allow_redirects=False)
+    recorder.count('paid')
+    return session_id
+
+
+def seed(db, args):
+    from werkzeug.security import generate_password_hash
+    from app.models import User, Book, GenreEnum
+
+    password_hash = generate_password_hash(PASSWORD)  # Hashed once, shared by every customer
+    emails = [f'loadtest{i}@example.com' for i in range(args.users)]
+    db.session.add_all([
+        User(username=f'loadtest{i}', email=email, password_hash=password_hash, role='user')
+        for i, email in enumerate(emails)
+    ])
+    books = [Book(title=f'Load Test Book {i}', author='Load Tester', price=9.99 + i,
+                  stock=args.stock, genre=list(GenreEnum)[0]) for i in range(args.books)]
+    db.session.add_all(books)
+    db.session.commit()
+    return emails, [book.id for book in books]
+
+
+def wait_for_inbox(db, timeout):
+    from app.models import StripeEvent
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        pending = StripeEvent.query.filter_by(status='pending').count()
+        db.session.rollback()
+        if not pending:
+            return True
+        time.sleep(0.2)
+    return False
+
+
+def find_anomalies(db, args, book_ids, paid_sessions):
+    from sqlalchemy import func
+    from app.models import Book, Order, OrderItem, Payment, StockLedger, StripeEvent
+
+    anomalies = []
+    for book_id, stock in db.session.query(Book.id, Book.stock).filter(Book.id.in_(book_ids)):
+        if stock < 0:
+            anomalies.append(f'book {book_id}: negative stock {stock}')
+        sold = db.session.query(func.coalesce(func.sum(OrderItem.quantity), 0)).join(Order).filter(
+            OrderItem.book_id == book_id, Order.status.notin_(['cancelled', 'refunded', 'backordered'])
+        ).scalar()
+        if sold > args.stock:
+            anomalies.append(f'book {book_id}: oversold, {sold} sold of {args.stock}')
+        ledger = db.session.query(func.coalesce(func.sum(StockLedger.change), 0)).filter(
+            StockLedger.book_id == book_id
+        ).scalar()
+        if args.stock + ledger != stock:
+            anomalies.append(f'book {book_id}: stock {stock} but ledger says {args.stock + ledger}')
+
+    for transaction_id, count in db.session.query(Payment.transaction_id, func.count()).group_by(
+        Payment.transaction_id
+    ).having(func.count() > 1):
+        anomalies.append(f'payment {transaction_id} recorded {count} times')
+    for user_id, count in db.session.query(Order.user_id, func.count()).group_by(
+        Order.user_id
+    ).having(func.count() > 1):
+        anomalies.append(f'user {user_id} got {count} orders for one checkout')
+
+    orders = Order.query.count()
+    if orders != len(paid_sessions):
+        anomalies.append(f'{len(paid_sessions)} paid checkouts but {orders} orders')
+    backordered = Order.query.filter_by(status='backordered').count()
+    if backordered:
+        anomalies.append(f'{backordered} paid orders backordered (holds should prevent this)')
+    failed = StripeEvent.query.filter_by(status='failed').count()
+    if failed:
+        anomalies.append(f'{failed} webhook events failed')
+    return orders, anomalies
+
+
+def main():
+    args = parse_args()
+    standin = StripeStandIn(webhook_secret=WEBHOOK_SECRET, deliveries=args.deliveries).start()
+
+    db_path = None
+    if not args.database_url:
+        db_fd, db_path = tempfile.mkstemp(suffix='.db')
+        os.close(db_fd)
+        args.database_url = 'sqlite:///' + db_path
+
+    # Read by app.config at import time
+    os.environ.update({
+        'STRIPE_API_BASE': standin.url,
+        'STRIPE_SECRET_KEY': 'sk_test_standin',
+        'STRIPE_WEBHOOK_SECRET': WEBHOOK_SECRET,
+        'STRIPE_INBOX_POLL_SECONDS': '1',
+    })
+    from flask_migrate import upgrade
+    from app import create_app, db
+    from app.config import Config
+
+    class LoadTestConfig(Config):
+        SQLALCHEMY_DATABASE_URI = args.database_url
+        SQLALCHEMY_ENGINE_OPTIONS = {'connect_args': {'timeout': 30}} if db_path else {}
+        WTF_CSRF_ENABLED = False
+
+    app = create_app(LoadTestConfig)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f'http://127.0.0.1:{server.server_port}'
+    standin.webhook_url = f'{base_url}/payment/webhook'
+
+    with app.app_context():
+        upgrade(directory=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations'))
+        emails, book_ids = seed(db, args)
+
+        recorder = Recorder()
+        print(f'{args.users} customers, {args.concurrency} at a time, {args.books} books x {args.stock} copies')
+        started = time.perf_counter()
+        with ThreadPoolExecutor(args.concurrency) as pool:
+            results = list(pool.map(
+                lambda email: customer(base_url, standin, email, book_ids, args, recorder), emails
+            ))
+        drained = wait_for_inbox(db, args.drain_timeout)
+        elapsed = time.perf_counter() - started
+
+        paid_sessions = [session_id for session_id in results if session_id]
+        orders, anomalies = find_anomalies(db, args, book_ids, paid_sessions)
+        if not drained:
+            anomalies.append(f'webhook inbox not drained after {args.drain_timeout}s')
+
+    server.shutdown()
+    standin.stop()
+    if db_path:
+        os.remove(db_path)
+
+    print(f'\n{orders} orders in {elapsed:.1f}s: {orders / elapsed:.1f} orders/second\n')
+    print(f'{"step":<18}{"count":>7}{"p50 ms":>10}{"p99 ms":>10}')
+    for step, values in recorder.latencies.items():
+        print(f'{step:<18}{len(values):>7}{percentile(values, 50) * 1000:>10.1f}{percentile(values, 99) * 1000:>10.1f}')
+    print('\nOutcomes: ' + ', '.join(f'{name} {count}' for name, count in sorted(recorder.outcomes.items())))
+    for error, count in sorted(recorder.errors.items(), key=lambda item: -item[1]):
+        print(f'  {count} x {error}')
+
+    print(f'\n{len(anomalies)} anomal{"y" if len(anomalies) == 1 else "ies"}')
+    for anomaly in anomalies:
+        print(f'  {anomaly}')
+    return 1 if anomalies else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,27 @@
+"""book updated_at
+
+Revision ID: 0272d95a8cd2
+Revises: 3f5cbf02e21d
+Create Date: 2026-10-17 13:07:49.116205
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0272d95a8cd2'
+down_revision = '3f5cbf02e21d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('book', sa.Column('updated_at', sa.DateTime(), nullable=True))
+    op.execute("UPDATE book SET updated_at = created_at")
+    op.execute("UPDATE catalog_version SET updated_at = (SELECT MAX(updated_at) FROM book) WHERE updated_at IS NULL")
+
+
+def downgrade():
+    # Plain ALTER (SQLite >= 3.35) so the full-text triggers on book survive
+    op.execute("ALTER TABLE book DROP COLUMN updated_at")
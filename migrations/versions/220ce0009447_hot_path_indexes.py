@@ -0,0 +1,61 @@
+"""hot path indexes
+
+Revision ID: 220ce0009447
+Revises: 6a1a10370832
+Create Date: 2026-10-17 10:41:05.772194
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '220ce0009447'
+down_revision = '6a1a10370832'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # One cart row per (user, book): fold duplicate rows into the oldest one first
+    op.execute("""
+        UPDATE cart SET quantity = (
+            SELECT SUM(c2.quantity) FROM cart c2
+            WHERE c2.user_id = cart.user_id AND c2.book_id = cart.book_id
+        )
+        WHERE id IN (
+            SELECT MIN(id) FROM cart GROUP BY user_id, book_id HAVING COUNT(*) > 1
+        )
+    """)
+    op.execute("""
+        DELETE FROM cart WHERE id NOT IN (
+            SELECT MIN(id) FROM cart GROUP BY user_id, book_id
+        )
+    """)
+    op.execute("""
+        DELETE FROM wishlist WHERE id NOT IN (
+            SELECT MIN(id) FROM wishlist GROUP BY user_id, book_id
+        )
+    """)
+
+    op.create_index('uq_cart_user_book', 'cart', ['user_id', 'book_id'], unique=True)
+    op.create_index('uq_wishlist_user_book', 'wishlist', ['user_id', 'book_id'], unique=True)
+    op.create_index('ix_book_created_at', 'book', ['created_at'], unique=False)
+    op.create_index('ix_order_created_at', 'order', ['created_at'], unique=False)
+    op.create_index('ix_order_user_created', 'order', ['user_id', 'created_at'], unique=False)
+    op.create_index('ix_order_status_created', 'order', ['status', 'created_at'], unique=False)
+    op.create_index('ix_order_item_order_id', 'order_item', ['order_id'], unique=False)
+    op.create_index('ix_order_item_book_id', 'order_item', ['book_id'], unique=False)
+    op.create_index('ix_payment_order_id', 'payment', ['order_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_payment_order_id', table_name='payment')
+    op.drop_index('ix_order_item_book_id', table_name='order_item')
+    op.drop_index('ix_order_item_order_id', table_name='order_item')
+    op.drop_index('ix_order_status_created', table_name='order')
+    op.drop_index('ix_order_user_created', table_name='order')
+    op.drop_index('ix_order_created_at', table_name='order')
+    op.drop_index('ix_book_created_at', table_name='book')
+    op.drop_index('uq_wishlist_user_book', table_name='wishlist')
+    op.drop_index('uq_cart_user_book', table_name='cart')
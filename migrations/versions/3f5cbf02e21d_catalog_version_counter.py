@@ -0,0 +1,30 @@
+"""catalog version counter
+
+Revision ID: 3f5cbf02e21d
+Revises: 220ce0009447
+Create Date: 2026-10-17 11:58:22.430918
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f5cbf02e21d'
+down_revision = '220ce0009447'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    catalog_version = op.create_table('catalog_version',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('generation', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.bulk_insert(catalog_version, [{'id': 1, 'generation': 0}])
+
+
+def downgrade():
+    op.drop_table('catalog_version')
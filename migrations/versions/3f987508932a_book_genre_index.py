@@ -0,0 +1,25 @@
+"""book genre index
+
+Revision ID: 3f987508932a
+Revises: 0272d95a8cd2
+Create Date: 2026-10-17 14:22:10.583127
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f987508932a'
+down_revision = '0272d95a8cd2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Exact genre facet, newest first
+    op.create_index('ix_book_genre_created', 'book', ['genre', 'created_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_book_genre_created', table_name='book')
@@ -0,0 +1,25 @@
+"""book title author index
+
+Revision ID: 4bf786030513
+Revises: 3f987508932a
+Create Date: 2026-10-17 15:36:54.902311
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4bf786030513'
+down_revision = '3f987508932a'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Bulk import matches existing books on (title, author)
+    op.create_index('ix_book_title_author', 'book', ['title', 'author'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_book_title_author', table_name='book')
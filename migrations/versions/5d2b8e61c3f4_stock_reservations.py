@@ -0,0 +1,45 @@
+"""stock reservations
+
+Revision ID: 5d2b8e61c3f4
+Revises: 9c41d2e7b5a0
+Create Date: 2026-10-17 17:04:51.218734
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5d2b8e61c3f4'
+down_revision = '9c41d2e7b5a0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('stock_reservation',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('reference', sa.String(length=36), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('book_id', sa.Integer(), nullable=False),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('expires_at', sa.DateTime(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['book_id'], ['book.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_reservation_book_status_expires', 'stock_reservation', ['book_id', 'status', 'expires_at'], unique=False)
+    op.create_index('ix_reservation_status_expires', 'stock_reservation', ['status', 'expires_at'], unique=False)
+    op.create_index('ix_reservation_user_status', 'stock_reservation', ['user_id', 'status'], unique=False)
+    op.create_index('ix_reservation_reference', 'stock_reservation', ['reference'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_reservation_reference', table_name='stock_reservation')
+    op.drop_index('ix_reservation_user_status', table_name='stock_reservation')
+    op.drop_index('ix_reservation_status_expires', table_name='stock_reservation')
+    op.drop_index('ix_reservation_book_status_expires', table_name='stock_reservation')
+
+    op.drop_table('stock_reservation')
@@ -0,0 +1,92 @@
+"""book full-text search
+
+Revision ID: 6a1a10370832
+Revises: 73d098f05ff3
+Create Date: 2026-10-17 09:12:41.208413
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '6a1a10370832'
+down_revision = '73d098f05ff3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+
+    if dialect == 'sqlite':
+        # External-content FTS5 index over book(title, author, genre)
+        op.execute("""
+            CREATE VIRTUAL TABLE book_fts USING fts5(
+                title, author, genre,
+                content='book', content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2',
+                prefix='2 3'
+            )
+        """)
+        op.execute("""
+            CREATE TRIGGER book_fts_ai AFTER INSERT ON book BEGIN
+                INSERT INTO book_fts(rowid, title, author, genre)
+                VALUES (new.id, new.title, new.author, new.genre);
+            END
+        """)
+        op.execute("""
+            CREATE TRIGGER book_fts_ad AFTER DELETE ON book BEGIN
+                INSERT INTO book_fts(book_fts, rowid, title, author, genre)
+                VALUES ('delete', old.id, old.title, old.author, old.genre);
+            END
+        """)
+        op.execute("""
+            CREATE TRIGGER book_fts_au AFTER UPDATE OF title, author, genre ON book BEGIN
+                INSERT INTO book_fts(book_fts, rowid, title, author, genre)
+                VALUES ('delete', old.id, old.title, old.author, old.genre);
+                INSERT INTO book_fts(rowid, title, author, genre)
+                VALUES (new.id, new.title, new.author, new.genre);
+            END
+        """)
+        # Index existing rows
+        op.execute("INSERT INTO book_fts(book_fts) VALUES ('rebuild')")
+
+    elif dialect == 'postgresql':
+        op.add_column('book', sa.Column('search_vector', postgresql.TSVECTOR(), nullable=True))
+        op.execute("""
+            CREATE FUNCTION book_search_vector_update() RETURNS trigger AS $$
+            BEGIN
+                NEW.search_vector :=
+                    setweight(to_tsvector('simple', coalesce(NEW.title, '')), 'A') ||
+                    setweight(to_tsvector('simple', coalesce(NEW.author, '')), 'B') ||
+                    setweight(to_tsvector('simple', coalesce(NEW.genre::text, '')), 'D');
+                RETURN NEW;
+            END
+            $$ LANGUAGE plpgsql
+        """)
+        op.execute("""
+            CREATE TRIGGER book_search_vector_trigger
+            BEFORE INSERT OR UPDATE OF title, author, genre ON book
+            FOR EACH ROW EXECUTE FUNCTION book_search_vector_update()
+        """)
+        # Index existing rows (fires the trigger)
+        op.execute("UPDATE book SET title = title")
+        op.create_index('ix_book_search_vector', 'book', ['search_vector'], postgresql_using='gin')
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+
+    if dialect == 'sqlite':
+        op.execute("DROP TRIGGER IF EXISTS book_fts_au")
+        op.execute("DROP TRIGGER IF EXISTS book_fts_ad")
+        op.execute("DROP TRIGGER IF EXISTS book_fts_ai")
+        op.execute("DROP TABLE IF EXISTS book_fts")
+
+    elif dialect == 'postgresql':
+        op.drop_index('ix_book_search_vector', table_name='book')
+        op.execute("DROP TRIGGER IF EXISTS book_search_vector_trigger ON book")
+        op.execute("DROP FUNCTION IF EXISTS book_search_vector_update()")
+        op.drop_column('book', 'search_vector')
@@ -0,0 +1,25 @@
+"""book cover image key
+
+Revision ID: 9c41d2e7b5a0
+Revises: 4bf786030513
+Create Date: 2026-10-17 16:12:08.447310
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9c41d2e7b5a0'
+down_revision = '4bf786030513'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('book', sa.Column('image_key', sa.String(length=64), nullable=True))
+
+
+def downgrade():
+    # Plain ALTER (SQLite >= 3.35) so the full-text triggers on book survive
+    op.execute("ALTER TABLE book DROP COLUMN image_key")
@@ -0,0 +1,39 @@
+"""stock ledger
+
+Revision ID: a4f0b6d8e913
+Revises: e7a3c9f1d245
+Create Date: 2026-10-17 21:38:52.904117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a4f0b6d8e913'
+down_revision = 'e7a3c9f1d245'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('stock_ledger',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('book_id', sa.Integer(), nullable=False),
+    sa.Column('order_id', sa.Integer(), nullable=True),
+    sa.Column('change', sa.Integer(), nullable=False),
+    sa.Column('reason', sa.String(length=32), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['book_id'], ['book.id'], ),
+    sa.ForeignKeyConstraint(['order_id'], ['order.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_stock_ledger_book_created', 'stock_ledger', ['book_id', 'created_at'], unique=False)
+    op.create_index('ix_stock_ledger_order_id', 'stock_ledger', ['order_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_stock_ledger_order_id', table_name='stock_ledger')
+    op.drop_index('ix_stock_ledger_book_created', table_name='stock_ledger')
+
+    op.drop_table('stock_ledger')
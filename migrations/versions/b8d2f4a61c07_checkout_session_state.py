@@ -0,0 +1,38 @@
+"""checkout session state
+
+Revision ID: b8d2f4a61c07
+Revises: a4f0b6d8e913
+Create Date: 2026-10-17 23:05:41.337902
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8d2f4a61c07'
+down_revision = 'a4f0b6d8e913'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('checkout_session',
+    sa.Column('id', sa.String(length=255), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('reference', sa.String(length=36), nullable=True),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('amount_total', sa.Integer(), nullable=True),
+    sa.Column('payment_intent', sa.String(length=255), nullable=True),
+    sa.Column('order_id', sa.Integer(), nullable=True),
+    sa.Column('expires_at', sa.DateTime(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['order_id'], ['order.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    op.drop_table('checkout_session')
@@ -0,0 +1,30 @@
+"""stats counters
+
+Revision ID: c3e9a7b15d84
+Revises: b8d2f4a61c07
+Create Date: 2026-10-18 00:21:16.874059
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3e9a7b15d84'
+down_revision = 'b8d2f4a61c07'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('stats_counter',
+    sa.Column('key', sa.String(length=64), nullable=False),
+    sa.Column('count', sa.BigInteger(), nullable=False),
+    sa.Column('amount', sa.Float(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('key')
+    )
+
+
+def downgrade():
+    op.drop_table('stats_counter')
@@ -0,0 +1,24 @@
+"""book updated_at index
+
+Revision ID: d5b1e8c3a7f2
+Revises: c3e9a7b15d84
+Create Date: 2026-10-18 09:12:40.518302
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd5b1e8c3a7f2'
+down_revision = 'c3e9a7b15d84'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_book_updated_at', 'book', ['updated_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_book_updated_at', table_name='book')
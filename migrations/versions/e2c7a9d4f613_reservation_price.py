@@ -0,0 +1,24 @@
+"""reservation price
+
+Revision ID: e2c7a9d4f613
+Revises: d5b1e8c3a7f2
+Create Date: 2026-10-18 10:03:27.640915
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2c7a9d4f613'
+down_revision = 'd5b1e8c3a7f2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('stock_reservation', sa.Column('price', sa.Float(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('stock_reservation', 'price')
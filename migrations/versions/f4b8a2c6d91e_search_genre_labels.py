@@ -0,0 +1,119 @@
+"""search genre labels
+
+Revision ID: f4b8a2c6d91e
+Revises: e2c7a9d4f613
+Create Date: 2026-10-19 09:41:05.118274
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f4b8a2c6d91e'
+down_revision = 'e2c7a9d4f613'
+branch_labels = None
+depends_on = None
+
+
+# GenreEnum as of this revision: stored name -> label shown to (and typed by) users
+GENRE_LABELS = {
+    'FICTION': 'Fiction',
+    'NONFICTION': 'Non-Fiction',
+    'PHILOSOPHY': 'Philosophy',
+    'MYSTERY': 'Mystery',
+    'ROMANCE': 'Romance',
+    'SCIENCE': 'Science',
+    'BIOGRAPHY': 'Biography',
+    'OTHER': 'Other',
+}
+
+
+def genre_label(column):
+    """SQL expression for the display label of a genre column"""
+    whens = ' '.join(f"WHEN '{name}' THEN '{label}'" for name, label in GENRE_LABELS.items())
+    return f"CASE {column} {whens} ELSE {column} END"
+
+
+def _sqlite_triggers(genre):
+    """Triggers keeping book_fts in sync, indexing ``genre(column)`` as the genre"""
+    op.execute(f"""
+        CREATE TRIGGER book_fts_ai AFTER INSERT ON book BEGIN
+            INSERT INTO book_fts(rowid, title, author, genre)
+            VALUES (new.id, new.title, new.author, {genre('new.genre')});
+        END
+    """)
+    op.execute(f"""
+        CREATE TRIGGER book_fts_ad AFTER DELETE ON book BEGIN
+            INSERT INTO book_fts(book_fts, rowid, title, author, genre)
+            VALUES ('delete', old.id, old.title, old.author, {genre('old.genre')});
+        END
+    """)
+    op.execute(f"""
+        CREATE TRIGGER book_fts_au AFTER UPDATE OF title, author, genre ON book BEGIN
+            INSERT INTO book_fts(book_fts, rowid, title, author, genre)
+            VALUES ('delete', old.id, old.title, old.author, {genre('old.genre')});
+            INSERT INTO book_fts(rowid, title, author, genre)
+            VALUES (new.id, new.title, new.author, {genre('new.genre')});
+        END
+    """)
+
+
+def _sqlite_rebuild(content, genre):
+    op.execute("DROP TRIGGER IF EXISTS book_fts_au")
+    op.execute("DROP TRIGGER IF EXISTS book_fts_ad")
+    op.execute("DROP TRIGGER IF EXISTS book_fts_ai")
+    op.execute("DROP TABLE IF EXISTS book_fts")
+    op.execute(f"""
+        CREATE VIRTUAL TABLE book_fts USING fts5(
+            title, author, genre,
+            content='{content}', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2',
+            prefix='2 3'
+        )
+    """)
+    _sqlite_triggers(genre)
+    op.execute("INSERT INTO book_fts(book_fts) VALUES ('rebuild')")
+
+
+def _postgres_rebuild(genre):
+    op.execute(f"""
+        CREATE OR REPLACE FUNCTION book_search_vector_update() RETURNS trigger AS $$
+        BEGIN
+            NEW.search_vector :=
+                setweight(to_tsvector('simple', coalesce(NEW.title, '')), 'A') ||
+                setweight(to_tsvector('simple', coalesce(NEW.author, '')), 'B') ||
+                setweight(to_tsvector('simple', coalesce({genre('NEW.genre::text')}, '')), 'D');
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    # Reindex existing rows (fires the trigger)
+    op.execute("UPDATE book SET title = title")
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+
+    if dialect == 'sqlite':
+        # The external content is a view with the label, so 'rebuild' and the
+        # triggers' 'delete' rows see the same genre text that was indexed
+        op.execute(f"""
+            CREATE VIEW book_fts_content AS
+            SELECT id, title, author, {genre_label('genre')} AS genre FROM book
+        """)
+        _sqlite_rebuild('book_fts_content', genre_label)
+
+    elif dialect == 'postgresql':
+        _postgres_rebuild(genre_label)
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+
+    if dialect == 'sqlite':
+        _sqlite_rebuild('book', lambda column: column)
+        op.execute("DROP VIEW IF EXISTS book_fts_content")
+
+    elif dialect == 'postgresql':
+        _postgres_rebuild(lambda column: column)
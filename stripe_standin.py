@@ -0,0 +1,217 @@
+"""Local stand-in for the parts of the Stripe API that checkout uses.
+
+Implements ``POST /v1/checkout/sessions`` and ``GET /v1/checkout/sessions/<id>``
+well enough for the stripe client library, and delivers signed webhook
+events (the ``Stripe-Signature`` scheme that ``stripe.Webhook.construct_event``
+verifies). Checkout sessions are kept in memory.
+
+Point the app at it with ``STRIPE_API_BASE=http://127.0.0.1:12111`` and
+``STRIPE_WEBHOOK_SECRET`` set to the stand-in's secret. A "customer" pays or
+abandons a session with:
+
+    POST /_standin/checkout/sessions/<id>/pay      -> checkout.session.completed
+    POST /_standin/checkout/sessions/<id>/expire   -> checkout.session.expired
+
+Both deliver the event to the webhook URL (``deliveries`` times, to mimic
+Stripe's at-least-once redelivery) and answer with the webhook's statuses.
+
+Usage: python stripe_standin.py [--port 12111] [--webhook-url URL] [--secret whsec_...]
+"""
+import argparse
+import hashlib
+import hmac
+import json
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl
+import requests
+
+
+def sign(payload, secret, timestamp=None):
+    """``Stripe-Signature`` header value for a webhook payload"""
+    timestamp = int(timestamp or time.time())
+    signature = hmac.new(secret.encode(), f'{timestamp}.{payload}'.encode(), hashlib.sha256).hexdigest()
+    return f't={timestamp},v1={signature}'
+
+
+def _unflatten(pairs):
+    """Stripe's form encoding (``line_items[0][quantity]=2``) -> nested dicts/lists"""
+    root = {}
+    for key, value in pairs:
+        parts = re.findall(r'[^\[\]]+', key)
+        node = root
+        for part in parts[:-1]:
+            node = node.setdefault(part, {})
+        node[parts[-1]] = value
+
+    def listify(node):
+        if not isinstance(node, dict):
+            return node
+        if node and all(key.isdigit() for key in node):
+            return [listify(node[key]) for key in sorted(node, key=int)]
+        return {key: listify(value) for key, value in node.items()}
+    return listify(root)
+
+
+class StripeStandIn:
+    """In-memory checkout sessions served over HTTP, plus webhook delivery"""
+
+    def __init__(self, webhook_url=None, webhook_secret='whsec_standin', deliveries=1,
+                 host='127.0.0.1', port=0):
+        self.webhook_url = webhook_url
+        self.webhook_secret = webhook_secret
+        self.deliveries = deliveries
+        self.sessions = {}
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def create_session(self, params):
+        line_items = params.get('line_items', [])
+        amount_total = sum(
+            int(item['price_data']['unit_amount']) * int(item.get('quantity', 1))
+            for item in line_items
+        )
+        session = {
+            'id': f'cs_test_{uuid.uuid4().hex}',
+            'object': 'checkout.session',
+            'mode': params.get('mode', 'payment'),
+            'status': 'open',
+            'payment_status': 'unpaid',
+            'payment_intent': None,
+            'amount_total': amount_total,
+            'currency': 'usd',
+            'client_reference_id': params.get('client_reference_id'),
+            'metadata': params.get('metadata', {}),
+            'success_url': params.get('success_url'),
+            'cancel_url': params.get('cancel_url'),
+            'expires_at': int(params.get('expires_at') or time.time() + 24 * 3600),
+            'created': int(time.time()),
+            'livemode': False,
+        }
+        session['url'] = f'{self.url}/pay/{session["id"]}'
+        with self.lock:
+            self.sessions[session['id']] = session
+        return session
+
+    def complete(self, session_id):
+        """Mark a session paid and deliver checkout.session.completed"""
+        with self.lock:
+            session = self.sessions[session_id]
+            if session['status'] != 'open':
+                return session, []
+            session.update(status='complete', payment_status='paid',
+                           payment_intent=f'pi_test_{uuid.uuid4().hex}')
+        return session, self.deliver('checkout.session.completed', session)
+
+    def expire(self, session_id):
+        """Expire an open session and deliver checkout.session.expired"""
+        with self.lock:
+            session = self.sessions[session_id]
+            if session['status'] != 'open':
+                return session, []
+            session['status'] = 'expired'
+        return session, self.deliver('checkout.session.expired', session)
+
+    def deliver(self, event_type, obj):
+        """POST one signed event to the webhook ``deliveries`` times; returns the statuses"""
+        if not self.webhook_url:
+            return []
+        payload = json.dumps({
+            'id': f'evt_test_{uuid.uuid4().hex}',
+            'object': 'event',
+            'type': event_type,
+            'created': int(time.time()),
+            'livemode': False,
+            'data': {'object': obj},
+        })
+        statuses = []
+        for _ in range(self.deliveries):
+            response = requests.post(self.webhook_url, data=payload, timeout=30, headers={
+                'Content-Type': 'application/json',
+                'Stripe-Signature': sign(payload, self.webhook_secret),
+            })
+            statuses.append(response.status_code)
+        return statuses
+
+    def _handler(self):
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass  # Quiet under load
+
+            def _reply(self, status, body):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _not_found(self):
+                self._reply(404, {'error': {'type': 'invalid_request_error',
+                                            'message': f'No such resource: {self.path}'}})
+
+            def do_GET(self):
+                match = re.fullmatch(r'/v1/checkout/sessions/([\w-]+)', self.path.split('?')[0])
+                session = match and standin.sessions.get(match.group(1))
+                if not session:
+                    return self._not_found()
+                self._reply(200, session)
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                body = self.rfile.read(length).decode()
+                path = self.path.split('?')[0]
+
+                if path == '/v1/checkout/sessions':
+                    return self._reply(200, standin.create_session(_unflatten(parse_qsl(body))))
+
+                match = re.fullmatch(r'/_standin/checkout/sessions/([\w-]+)/(pay|expire)', path)
+                if not match or match.group(1) not in standin.sessions:
+                    return self._not_found()
+                action = standin.complete if match.group(2) == 'pay' else standin.expire
+                session, statuses = action(match.group(1))
+                self._reply(200, {'session': session, 'webhook_statuses': statuses})
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=12111)
+    parser.add_argument('--webhook-url', default='http://127.0.0.1:5000/payment/webhook')
+    parser.add_argument('--secret', default='whsec_standin', help='webhook signing secret')
+    parser.add_argument('--deliveries', type=int, default=1, help='times each event is delivered')
+    args = parser.parse_args()
+
+    standin = StripeStandIn(args.webhook_url, args.secret, args.deliveries, args.host, args.port)
+    print(f'Stripe stand-in on {standin.url} delivering to {args.webhook_url}')
+    try:
+        standin.server.serve_forever()
+    except KeyboardInterrupt:
+        standin.stop()
+
+
+if __name__ == '__main__':
+    main()